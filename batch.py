@@ -0,0 +1,388 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from scrape import extract_body_content, clean_body_content, split_dom_content
+from fetch import fetch_page
+from snapshots import SnapshotStore, refresh_snapshot, DEFAULT_SNAPSHOT_PATH
+from dedup import ChunkDeduplicator, DEFAULT_THRESHOLD
+from driver_pool import DriverPool
+from render_profiles import PROFILES
+from service import ServiceClient, ServiceBusy, BATCH_PRIORITY
+from wait_strategies import get_wait_strategy
+import metrics
+import threading
+import argparse
+import random
+import uuid
+import json
+import sys
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class HostLimiter:
+    """Caps concurrent requests per host and spaces out request starts by `delay` seconds"""
+
+    def __init__(self, per_host=2, delay=1.0):
+        self.per_host = per_host
+        self.delay = delay
+        self._semaphores = {}
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    def acquire(self, host):
+        self._semaphore(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host):
+        self._semaphore(host).release()
+
+
+def iter_urls(source):
+    """Yield URLs one at a time from an open file, skipping blanks and # comments"""
+    for line in source:
+        url = line.strip()
+        if url and not url.startswith("#"):
+            yield url
+
+
+def backoff_delay(backoff, attempt):
+    # Exponential backoff with jitter so retries against one host don't line up
+    return backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+def scrape_and_clean(url, limiter, retries=3, backoff=2.0, store=None, deduplicator=None, **fetch_options):
+    """
+    Run fetch -> extract -> clean for one URL with per-host limits and retries; returns a result record.
+    With a snapshot `store`, unchanged pages are revalidated instead of downloaded again. With a
+    `deduplicator`, the record also lists the page's chunks minus those repeated from other pages.
+    """
+    host = urlsplit(url).netloc
+    started = time.monotonic()
+    last_error = None
+    for attempt in range(1, retries + 1):
+        limiter.acquire(host)
+        try:
+            changes = {}
+            chunks = None
+            if store is not None:
+                content, diff, not_modified = refresh_snapshot(url, store, **fetch_options)
+                changes = {"not_modified": not_modified, "chunks": len(diff.chunks), "changed_chunks": len(diff.changed)}
+                chunks = diff.chunks
+            else:
+                html = fetch_page(url, **fetch_options)
+                content = clean_body_content(extract_body_content(html))
+            if deduplicator is not None:
+                if chunks is None:
+                    chunks = split_dom_content(content)
+                unique_chunks = deduplicator.filter(chunks, source=url)
+                changes["unique_chunks"] = unique_chunks
+                changes["duplicate_chunks"] = len(chunks) - len(unique_chunks)
+            return {
+                "url": url,
+                "ok": True,
+                "content": content,
+                **changes,
+                "attempts": attempt,
+                "elapsed": round(time.monotonic() - started, 3),
+            }
+        except Exception as e:
+            last_error = e
+            logging.warning(f"Attempt {attempt}/{retries} failed for {url}: {e}")
+        finally:
+            limiter.release(host)
+        if attempt < retries:
+            time.sleep(backoff_delay(backoff, attempt))
+    return {
+        "url": url,
+        "ok": False,
+        "error": str(last_error),
+        "attempts": retries,
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+
+
+def run_batch(urls, output, workers=8, per_host=2, delay=1.0, retries=3, backoff=2.0, store=None,
+              deduplicator=None, **fetch_options):
+    """
+    Process `urls` concurrently and write one JSON line per page to `output` as soon as it finishes.
+
+    At most `workers * 2` pages are queued or in flight at any time, so memory stays flat no
+    matter how long the URL iterator is.
+    """
+    limiter = HostLimiter(per_host=per_host, delay=delay)
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def write_result(future):
+        try:
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"url": future.url, "ok": False, "error": str(e)}
+            with write_lock:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                counts["ok" if record["ok"] else "failed"] += 1
+        except Exception as e:
+            logging.error(f"An error occurred while writing the result for {future.url}: {e}")
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url in urls:
+            in_flight.acquire()
+            future = executor.submit(scrape_and_clean, url, limiter, retries, backoff, store, deduplicator,
+                                     **fetch_options)
+            future.url = url
+            future.add_done_callback(write_result)
+
+    logging.info(f"Batch finished: {counts['ok']} succeeded, {counts['failed']} failed.")
+    if deduplicator is not None:
+        logging.info(f"Skipped {deduplicator.skipped} near-duplicate chunks across the batch.")
+    return counts
+
+
+def submit_when_ready(submit, *args, retry_delay=1.0, **kwargs):
+    """Call a service submit method, waiting and retrying while its queue is full"""
+    while True:
+        try:
+            return submit(*args, **kwargs)
+        except ServiceBusy:
+            time.sleep(retry_delay)
+
+
+def scrape_with_service(url, client, limiter, retries=3, backoff=2.0, priority=BATCH_PRIORITY, **scrape_options):
+    """
+    Run a scrape job for `url` on the service with the same per-host limits and
+    retries as a local batch; returns the finished job and the number of attempts.
+    """
+    host = urlsplit(url).netloc
+    last_error = None
+    for attempt in range(1, retries + 1):
+        # The host slot is held until the job has finished, not just while it's submitted
+        limiter.acquire(host)
+        try:
+            job = submit_when_ready(client.submit_scrape, url, priority=priority, **scrape_options)
+            job = client.wait_job(job["id"])
+            if job["status"] == "done":
+                return job, attempt
+            last_error = RuntimeError(job["error"] or f"Scrape job {job['status']}")
+        except Exception as e:
+            last_error = e
+        finally:
+            limiter.release(host)
+        logging.warning(f"Attempt {attempt}/{retries} failed for {url}: {last_error}")
+        if attempt < retries:
+            time.sleep(backoff_delay(backoff, attempt))
+    raise last_error
+
+
+def process_with_service(url, client, limiter, retries=3, backoff=2.0, parse_description=None,
+                         priority=BATCH_PRIORITY, deduplicator=None, dedup_scope=None, top_k=8, min_score=0.0,
+                         **scrape_options):
+    """
+    Scrape (and optionally parse) one URL through a running service; returns a result record.
+    With a `deduplicator`, the record also lists the page's chunks minus those repeated from
+    other pages, and parse jobs skip them within `dedup_scope`. Parse jobs only send the
+    `top_k` chunks most related to the description scoring above `min_score` (every chunk
+    when top_k is 0); the record counts the chunks skipped for each reason.
+    """
+    started = time.monotonic()
+    record = {"url": url}
+    try:
+        job, attempts = scrape_with_service(url, client, limiter, retries, backoff, priority, **scrape_options)
+        record.update(ok=True, content=client.get_document(job["result"]["document_id"])["content"], **job["result"])
+        record["attempts"] = attempts
+        if deduplicator is not None:
+            chunks = client.get_chunks(job["result"]["chunks_id"])["chunks"]
+            record["unique_chunks"] = deduplicator.filter(chunks, source=url)
+            record["duplicate_chunks"] = len(chunks) - len(record["unique_chunks"])
+        if parse_description:
+            dedup = {}
+            if deduplicator is not None:
+                dedup = {"dedup_threshold": deduplicator.threshold, "dedup_scope": dedup_scope}
+            job = submit_when_ready(client.submit_parse, job["result"]["chunks_id"], parse_description,
+                                    priority=priority, top_k=top_k, min_score=min_score, **dedup)
+            skipped = {}
+            for event in client.iter_events(job["id"]):
+                if event["type"] == "skipped":
+                    skipped[event["reason"]] = skipped.get(event["reason"], 0) + len(event["chunks"])
+            job = client.get_job(job["id"])
+            if job["status"] != "done":
+                raise RuntimeError(job["error"] or f"Parse job {job['status']}")
+            record["parsed"] = job["result"]["text"]
+            record["skipped_chunks"] = skipped
+    except Exception as e:
+        logging.warning(f"Service job failed for {url}: {e}")
+        record.update(ok=False, error=str(e))
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run_batch_with_service(urls, output, client, parse_description=None, pending=8, priority=BATCH_PRIORITY,
+                           per_host=2, delay=1.0, retries=3, backoff=2.0, deduplicator=None, top_k=8, min_score=0.0,
+                           **scrape_options):
+    """
+    Submit every URL to a running service and write one JSON line per page as soon as it finishes.
+
+    The service's own worker pools decide how many pages are scraped and parsed at once; at
+    most `pending` pages are submitted and waited on at a time, and submissions wait while
+    the service reports its queue as full. Per-host limits and retries apply as in run_batch.
+    """
+    limiter = HostLimiter(per_host=per_host, delay=delay)
+    # Parse jobs only skip chunks repeated within this batch
+    dedup_scope = f"batch-{uuid.uuid4().hex}"
+    in_flight = threading.BoundedSemaphore(pending)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def write_result(future):
+        try:
+            record = future.result()
+            with write_lock:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                counts["ok" if record["ok"] else "failed"] += 1
+        except Exception as e:
+            logging.error(f"An error occurred while writing the result for {future.url}: {e}")
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=pending) as executor:
+        for url in urls:
+            in_flight.acquire()
+            future = executor.submit(process_with_service, url, client, limiter, retries, backoff, parse_description,
+                                     priority, deduplicator, dedup_scope, top_k, min_score, **scrape_options)
+            future.url = url
+            future.add_done_callback(write_result)
+
+    logging.info(f"Batch finished: {counts['ok']} succeeded, {counts['failed']} failed.")
+    if deduplicator is not None:
+        logging.info(f"Skipped {deduplicator.skipped} near-duplicate chunks across the batch.")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI Web Scraper - batch mode')
+    parser.add_argument('input', nargs='?', default='-', help='File with one URL per line, or - for stdin')
+    parser.add_argument('-o', '--output', type=str, default='-', help='JSONL file to write results to, or - for stdout')
+    parser.add_argument('--workers', type=int, default=8, help='The number of pages processed concurrently')
+    parser.add_argument('--per-host', type=int, default=2, help='The maximum number of concurrent requests per host')
+    parser.add_argument('--delay', type=float, default=1.0, help='The minimum number of seconds between requests to the same host')
+    parser.add_argument('--retries', type=int, default=3, help='The number of attempts per URL')
+    parser.add_argument('--backoff', type=float, default=2.0, help='The base number of seconds to back off between attempts')
+    parser.add_argument('--wait', type=float, default=5, help='The maximum number of seconds to wait for the page to load')
+    parser.add_argument('--wait-for', type=str, default=None,
+                        help='Comma-separated page-readiness checks: readystate, network-idle, dom-quiet, selector:<css>')
+    parser.add_argument('--force-browser', action='store_true', help='Always render pages in Chrome instead of trying a plain HTTP fetch first')
+    parser.add_argument('--render-profile', type=str, default=None, choices=sorted(PROFILES),
+                        help='How Chrome renders pages for hosts without a profile of their own (default: SCRAPER_RENDER_PROFILE)')
+    parser.add_argument('--pool-size', type=int, default=2, help='The maximum number of Chrome sessions kept warm for scraping')
+    parser.add_argument('--snapshots', nargs='?', const=DEFAULT_SNAPSHOT_PATH, default=None, metavar='PATH',
+                        help='Keep a snapshot of every page (in SNAPSHOT_PATH unless a file is given) and reuse it when the page has not changed')
+    parser.add_argument('--dedup', nargs='?', type=float, const=DEFAULT_THRESHOLD, default=None, metavar='THRESHOLD',
+                        help='Add each page\'s chunks to its record, minus those at least this similar to a chunk of another page')
+    parser.add_argument('--service', type=str, default=None,
+                        help='URL of a running service (python service.py) to submit the pages to as jobs')
+    parser.add_argument('--parse', type=str, default=None, metavar='DESCRIPTION',
+                        help='With --service, also parse every page for this description')
+    parser.add_argument('--top-k', type=int, default=8,
+                        help='With --parse, send only the k chunks of each page most related to the description (0 sends every chunk)')
+    parser.add_argument('--min-score', type=float, default=0.0,
+                        help='With --parse, skip chunks whose relevance score is not above this value')
+    parser.add_argument('--priority', type=int, default=BATCH_PRIORITY,
+                        help='With --service, the priority of the submitted jobs (lower runs first)')
+    parser.add_argument('--trace-file', type=str, help='Append a JSON line per timed stage to this file')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port while the batch runs')
+    args = parser.parse_args(argv)
+
+    if args.trace_file or args.metrics_port:
+        metrics.enable(args.trace_file)
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+
+    if args.parse and not args.service:
+        parser.error("--parse requires --service")
+    if args.snapshots and args.service:
+        parser.error("--snapshots can't be used with --service; the service keeps its own snapshots (see SNAPSHOT_PATH)")
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    if args.service:
+        try:
+            counts = run_batch_with_service(
+                iter_urls(source),
+                output,
+                ServiceClient(args.service),
+                parse_description=args.parse,
+                pending=args.workers,
+                priority=args.priority,
+                per_host=args.per_host,
+                delay=args.delay,
+                retries=args.retries,
+                backoff=args.backoff,
+                deduplicator=ChunkDeduplicator(threshold=args.dedup) if args.dedup else None,
+                top_k=args.top_k,
+                min_score=args.min_score,
+                wait=args.wait,
+                wait_for=args.wait_for,
+                force_browser=args.force_browser,
+                render_profile=args.render_profile,
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if output is not sys.stdout:
+                output.close()
+        return 0 if counts["failed"] == 0 else 1
+
+    pool = DriverPool(size=args.pool_size)
+    store = SnapshotStore(args.snapshots) if args.snapshots else None
+    try:
+        counts = run_batch(
+            iter_urls(source),
+            output,
+            workers=args.workers,
+            per_host=args.per_host,
+            delay=args.delay,
+            retries=args.retries,
+            backoff=args.backoff,
+            wait=args.wait,
+            wait_strategy=get_wait_strategy(args.wait_for),
+            pool=pool,
+            store=store,
+            deduplicator=ChunkDeduplicator(threshold=args.dedup) if args.dedup else None,
+            force_browser=args.force_browser,
+            profile=args.render_profile,
+        )
+    finally:
+        pool.close()
+        if store is not None:
+            store.close()
+        if metrics.is_enabled():
+            logging.info(f"Stage timings: {metrics.summary()}")
+            metrics.disable()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Fixture corpus for the offline benchmarks.
+
+The saved pages in benchmarks/corpus/ are small, realistic documents (an
+article, a product listing and a documentation page). Larger pages are built
+deterministically from them at load time, so multi-MB inputs don't have to
+live in the repository.
+"""
+import os
+import re
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Sizes, in KB, of the pages generated from the saved ones
+SCALED_SIZES_KB = (256, 1024, 4096)
+
+_BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+
+
+def load_saved_pages():
+    """Return {name: html} for every saved page, in name order"""
+    pages = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                pages[filename[:-len(".html")]] = f.read()
+    return pages
+
+
+def build_scaled_page(pages, size_kb):
+    """
+    Build a page of roughly `size_kb` KB by repeating the bodies of the saved
+    pages in turn, each copy numbered so the text isn't identical throughout.
+    """
+    bodies = [_BODY_RE.search(html).group(1) for html in pages.values()]
+    target = size_kb * 1024
+    parts = []
+    size = 0
+    copy = 0
+    while size < target:
+        part = f'<section data-copy="{copy}"><h2>Part {copy}</h2>{bodies[copy % len(bodies)]}</section>\n'
+        parts.append(part)
+        size += len(part)
+        copy += 1
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Scaled benchmark page</title></head>"
+        f"<body>{''.join(parts)}</body></html>"
+    )
+
+
+def load_corpus(sizes_kb=SCALED_SIZES_KB):
+    """Return [(name, html)]: the saved pages followed by one generated page per size"""
+    pages = load_saved_pages()
+    corpus = list(pages.items())
+    for size_kb in sizes_kb:
+        corpus.append((f"scaled_{size_kb}kb", build_scaled_page(pages, size_kb)))
+    return corpus
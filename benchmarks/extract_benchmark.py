@@ -0,0 +1,83 @@
+"""
+Compare the streaming lxml extractor with the previous BeautifulSoup path.
+
+    python benchmarks/extract_benchmark.py [--sizes 100,1000,5000] [--repeat 3]
+
+Sizes are approximate page sizes in KB. Reports the best wall time of
+`--repeat` runs, the peak Python heap (tracemalloc) of one run and how far
+the process's peak RSS rose during another. lxml allocates its parser state
+natively, which only the RSS column sees.
+"""
+from bs4 import BeautifulSoup
+import argparse
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract import extract_text  # noqa: E402
+from memory import python_heap_peak, rss_peak_growth  # noqa: E402
+
+SECTION = (
+    "<section><h2>Section {n}</h2>"
+    "<p>Paragraph {n} talks about products, prices and shipping. It has <a href='/p/{n}'>a link</a>, "
+    "<b>bold text</b> and enough words to look like a real article body.</p>"
+    "<ul><li>Feature {n}.1</li><li>Feature {n}.2</li><li>Feature {n}.3</li></ul>"
+    "<table><tr><th>Item</th><th>Price</th></tr><tr><td>Item {n}</td><td>${n}.99</td></tr></table>"
+    "<script>window.dataLayer.push({{event: 'view', id: {n}, payload: '{padding}'}});</script>"
+    "<style>.s{n} {{ color: #{n:06d}; margin: 0 auto; }}</style>"
+    "</section>\n"
+)
+
+PAGE = (
+    "<!DOCTYPE html><html><head><title>Benchmark page</title>"
+    "<script src='/app.js'></script><style>body {{ font-family: sans-serif; }}</style></head><body>"
+    "<nav><ul><li><a href='/'>Home</a></li><li><a href='/shop'>Shop</a></li></ul></nav>"
+    "<main>{sections}</main>"
+    "<footer><p>Copyright, terms, privacy, cookies.</p></footer></body></html>"
+)
+
+
+def make_page(size_kb):
+    section = SECTION.format(n=0, padding="x" * 200)
+    count = max(1, (size_kb * 1024) // len(section))
+    sections = "".join(SECTION.format(n=n, padding="x" * 200) for n in range(count))
+    return PAGE.format(sections=sections)
+
+
+def extract_with_beautifulsoup(html):
+    # The extraction path used before the streaming extractor
+    soup = BeautifulSoup(html, 'html.parser')
+    return soup.find('body').get_text()
+
+
+def measure(func, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(html)
+        best = min(best, time.perf_counter() - start)
+    return best, python_heap_peak(func, html), rss_peak_growth(func, html), len(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark HTML text extraction')
+    parser.add_argument('--sizes', type=str, default='100,1000,5000', help='Comma-separated page sizes in KB')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of timed runs per measurement')
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>9} {'extractor':>14} {'time (s)':>9} {'MB/s':>7} {'py heap (MB)':>13} {'RSS peak (MB)':>14} "
+          f"{'output chars':>13}")
+    for size_kb in (int(size) for size in args.sizes.split(',')):
+        html = make_page(size_kb)
+        mb = len(html) / (1024 * 1024)
+        for name, func in (("beautifulsoup", extract_with_beautifulsoup), ("streaming", extract_text)):
+            elapsed, heap_peak, rss_peak, chars = measure(func, html, args.repeat)
+            rss = f"{rss_peak / (1024 * 1024):.1f}" if rss_peak is not None else "n/a"
+            print(f"{len(html) // 1024:>7}KB {name:>14} {elapsed:>9.3f} {mb / elapsed:>7.1f} "
+                  f"{heap_peak / (1024 * 1024):>13.1f} {rss:>14} {chars:>13}")
+
+
+if __name__ == "__main__":
+    main()
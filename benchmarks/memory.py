@@ -0,0 +1,60 @@
+"""
+Peak memory of a single call, measured two ways.
+
+tracemalloc only sees memory allocated through Python's allocator, so native
+allocations (libxml2 trees, SQLite pages) are missing from it. The process's
+peak resident set size covers both, so the benchmarks report the two side by
+side.
+"""
+import tracemalloc
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def python_heap_peak(func, *args):
+    """Peak Python heap allocated during func(*args), in bytes"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(f"No {field} in /proc/self/status")
+
+
+def rss_peak_growth(func, *args):
+    """
+    How far the process's peak RSS rose above its RSS at the start of
+    func(*args), in bytes, or None where it can't be measured. Memory freed
+    by earlier calls but kept by the allocator is reused without raising the
+    RSS, so this can read lower than the Python heap peak.
+    """
+    try:
+        # Linux: writing 5 resets the peak (VmHWM) to the current RSS
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _status_kb("VmRSS")
+    except OSError:
+        before = None
+    if before is not None:
+        func(*args)
+        return max(0, _status_kb("VmHWM") - before) * 1024
+    if resource is None:
+        func(*args)
+        return None
+    # ru_maxrss can't be reset, so a call that stays below an earlier peak reports 0
+    scale = 1 if sys.platform == "darwin" else 1024
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(*args)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * scale
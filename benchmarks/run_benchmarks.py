@@ -0,0 +1,200 @@
+"""
+Offline benchmark suite for the scraping and parsing pipeline.
+
+Runs extract_body_content, clean_body_content, split_dom_content and
+simple_fallback_parser over the fixture corpus, and parse_with_ollama end to
+end against a local stub of the Ollama API. For each benchmark it records
+latency percentiles, throughput, peak Python heap and peak RSS growth, and writes them to a
+JSON file that later runs can be compared against:
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+
+With --compare, the exit status is 1 when any benchmark's median latency got
+slower than the baseline by more than --threshold.
+"""
+from datetime import datetime, timezone
+import argparse
+import platform
+import math
+import json
+import time
+import sys
+import os
+import logging
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from corpus import load_corpus  # noqa: E402
+from stub_ollama import StubOllama  # noqa: E402
+from memory import python_heap_peak, rss_peak_growth  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results", "latest.json")
+PARSE_DESCRIPTION = "prices, product names and ratings"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def measure(func, args, runs, input_bytes=None, items=None):
+    """Time `runs` calls of func(*args) after one warm-up call, then measure peak memory of two more"""
+    func(*args)
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+
+    # Separate calls, so tracemalloc's own bookkeeping doesn't inflate the RSS
+    heap_peak = python_heap_peak(func, *args)
+    rss_peak = rss_peak_growth(func, *args)
+
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        "runs": runs,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(total / runs * 1000, 3),
+        # Python allocations only; native ones (libxml2, SQLite) are only in the RSS
+        "py_heap_peak_mb": round(heap_peak / (1024 * 1024), 3),
+        "rss_peak_mb": round(rss_peak / (1024 * 1024), 3) if rss_peak is not None else None,
+    }
+    if input_bytes:
+        result["throughput_mb_s"] = round(input_bytes * runs / total / (1024 * 1024), 3)
+    if items:
+        result["items_per_s"] = round(items * runs / total, 3)
+    return result
+
+
+def run_pipeline_benchmarks(corpus, runs):
+    from scrape import extract_body_content, clean_body_content, split_dom_content
+    from parse import simple_fallback_parser
+
+    results = {}
+    for name, html in corpus:
+        # Large pages take seconds per run; scale the run count down so the suite stays quick
+        page_runs = max(3, runs // max(1, len(html) // (256 * 1024)))
+        body = extract_body_content(html)
+        cleaned = clean_body_content(body)
+        chunks = split_dom_content(cleaned)
+
+        results[f"extract_body_content:{name}"] = measure(
+            extract_body_content, (html,), page_runs, input_bytes=len(html))
+        results[f"clean_body_content:{name}"] = measure(
+            clean_body_content, (body,), page_runs, input_bytes=len(body))
+        results[f"split_dom_content:{name}"] = measure(
+            split_dom_content, (cleaned,), page_runs, input_bytes=len(cleaned), items=len(chunks))
+        results[f"simple_fallback_parser:{name}"] = measure(
+            simple_fallback_parser, (chunks, PARSE_DESCRIPTION), page_runs,
+            input_bytes=len(cleaned), items=len(chunks))
+        print(f"  {name}: {len(html) // 1024} KB, {len(chunks)} chunks")
+    return results
+
+
+def run_llm_benchmarks(corpus, runs, concurrency):
+    from scrape import extract_body_content, clean_body_content, split_dom_content
+    from parse import parse_with_ollama
+
+    results = {}
+    for name, html in corpus:
+        chunks = split_dom_content(clean_body_content(extract_body_content(html)))
+        # Keep the end-to-end run bounded on the multi-MB pages
+        chunks = chunks[:32]
+        results[f"parse_with_ollama:{name}"] = measure(
+            lambda: parse_with_ollama(chunks, PARSE_DESCRIPTION, max_workers=concurrency, use_cache=False),
+            (), max(3, runs // 4), items=len(chunks))
+        print(f"  {name}: {len(chunks)} chunks through the stub")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison of median latencies and return the names of regressed benchmarks"""
+    regressions = []
+    print(f"\n{'benchmark':<60} {'base p50':>10} {'new p50':>10} {'change':>8}")
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not isinstance(result, dict) or not isinstance(old, dict):
+            continue
+        change = (result["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<60} {old['p50_ms']:>10.2f} {result['p50_ms']:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite')
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT, help='Where to write the JSON results')
+    parser.add_argument('--compare', type=str, help='A previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative slowdown of the median latency reported as a regression')
+    parser.add_argument('--runs', type=int, default=20, help='Timed runs per benchmark on small pages')
+    parser.add_argument('--sizes', type=str, default=None,
+                        help='Comma-separated sizes in KB of the generated pages (default: 256,1024,4096)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub Ollama latency before the first token, in seconds')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Stub Ollama delay between tokens, in seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='max_workers passed to parse_with_ollama')
+    parser.add_argument('--skip-llm', action='store_true', help='Skip the end-to-end parse_with_ollama benchmarks')
+    args = parser.parse_args(argv)
+
+    # Keep the pipeline's logging out of the timings and the output
+    logging.disable(logging.WARNING)
+
+    sizes = tuple(int(size) for size in args.sizes.split(',')) if args.sizes else None
+    corpus = load_corpus(sizes) if sizes else load_corpus()
+
+    # parse.py reads the server address when it is first imported, so start the stub before anything else
+    stub = None
+    if not args.skip_llm:
+        stub = StubOllama(latency=args.latency, token_delay=args.token_delay).start()
+        os.environ["OLLAMA_API_URL"] = stub.base_url
+    try:
+        print("Pipeline stages:")
+        results = run_pipeline_benchmarks(corpus, args.runs)
+        if stub is not None:
+            print("End-to-end parse_with_ollama:")
+            results.update(run_llm_benchmarks(corpus, args.runs, args.concurrency))
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub_latency": args.latency,
+            "stub_token_delay": args.token_delay,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+A local stand-in for the Ollama HTTP API, for benchmarks that must run offline.
+
+It answers /api/version, /api/tags, /api/generate and /api/chat (streaming
+and non-streaming) with a short canned answer after a configurable latency.
+
+    python benchmarks/stub_ollama.py --port 11434 --latency 0.2 --token-delay 0.01
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from datetime import datetime, timezone
+import threading
+import argparse
+import json
+import time
+import sys
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-answer; that's expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubOllama:
+    """
+    Runs the stub server in a background thread.
+
+    `latency` is the delay before the first token of every generation and
+    `token_delay` the delay between streamed tokens.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, token_delay=0.0, answer_words=20):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer_words = answer_words
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def answer_tokens(self, prompt):
+        # Deterministic answer whose length doesn't depend on the prompt
+        words = prompt.split()[:self.answer_words] or ["empty"]
+        return [word + " " for word in words]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-stub"})
+                elif self.path == "/api/tags":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/api/generate":
+                    prompt = request.get("prompt", "")
+                elif self.path == "/api/chat":
+                    prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                self._generate(request, prompt, chat=self.path == "/api/chat")
+
+            def _message(self, request, text, done, chat, extra=None):
+                message = {
+                    "model": request.get("model", "stub"),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "done": done,
+                }
+                if chat:
+                    message["message"] = {"role": "assistant", "content": text}
+                else:
+                    message["response"] = text
+                message.update(extra or {})
+                return message
+
+            def _generate(self, request, prompt, chat):
+                # An empty prompt just loads the model, like the real server
+                tokens = stub.answer_tokens(prompt) if prompt.strip() else []
+                final = {
+                    "done_reason": "stop",
+                    "prompt_eval_count": len(prompt.split()),
+                    "eval_count": len(tokens),
+                }
+                time.sleep(stub.latency)
+                if not request.get("stream", True):
+                    time.sleep(stub.token_delay * len(tokens))
+                    self._send_json(self._message(request, "".join(tokens), True, chat, final))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i and stub.token_delay:
+                        time.sleep(stub.token_delay)
+                    self._write_chunk(self._message(request, token, False, chat))
+                self._write_chunk(self._message(request, "", True, chat, final))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stub Ollama server for offline benchmarks')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='The address to listen on')
+    parser.add_argument('--port', type=int, default=11434, help='The port to listen on')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before the first token of each answer')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between streamed tokens')
+    args = parser.parse_args(argv)
+
+    stub = StubOllama(args.host, args.port, latency=args.latency, token_delay=args.token_delay)
+    print(f"Stub Ollama listening on {stub.base_url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import math
+import re
+
+# Approximate characters per token for English text, by model family. Larger
+# vocabularies pack more characters into a token; unknown models use the
+# conservative default.
+CHARS_PER_TOKEN = {
+    "llama3": 4.2,
+    "llama3.1": 4.2,
+    "llama3.2": 4.2,
+    "qwen2": 4.0,
+    "qwen2.5": 4.0,
+    "gemma": 4.0,
+    "gemma2": 4.0,
+    "llama2": 3.5,
+    "mistral": 3.5,
+    "mixtral": 3.5,
+    "phi3": 3.5,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.5
+
+# Roughly the 4000 characters chunks used to be
+DEFAULT_CHUNK_TOKENS = 1000
+
+_PARAGRAPH_RE = re.compile(r'[^\n]+')
+_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?](?=\s|$)|$)', re.DOTALL)
+_WORD_RE = re.compile(r'\S+')
+
+
+def chars_per_token(model=None):
+    """Characters per token for `model`, matched on the family name before any ':tag'"""
+    if not model:
+        return DEFAULT_CHARS_PER_TOKEN
+    family = model.split(":", 1)[0].lower()
+    return CHARS_PER_TOKEN.get(family, DEFAULT_CHARS_PER_TOKEN)
+
+
+def estimate_tokens(text, model=None):
+    """Approximate the number of tokens `model` would use for `text`"""
+    return math.ceil(len(text) / chars_per_token(model))
+
+
+def _iter_pieces(content, max_chars):
+    """
+    Yield (separator, text) pieces no longer than `max_chars`, splitting
+    paragraphs into sentences, sentences into words and words into slices
+    only when the larger unit doesn't fit.
+    """
+    for paragraph in _PARAGRAPH_RE.finditer(content):
+        paragraph = paragraph.group(0).strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield "\n", paragraph
+            continue
+        separator = "\n"
+        for sentence in _SENTENCE_RE.finditer(paragraph):
+            sentence = sentence.group(0).strip()
+            if len(sentence) <= max_chars:
+                yield separator, sentence
+                separator = " "
+                continue
+            for word in _WORD_RE.finditer(sentence):
+                word = word.group(0)
+                for start in range(0, len(word), max_chars):
+                    yield (separator if start == 0 else ""), word[start:start + max_chars]
+                    separator = " "
+
+
+def iter_chunks(content, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=0, model=None):
+    """
+    Lazily split `content` into chunks of at most `max_tokens` estimated tokens.
+
+    Chunks break on paragraph boundaries where possible, then sentences, then
+    words. Each chunk after the first starts with up to `overlap_tokens` of the
+    previous chunk's trailing text. Runs in a single pass over the content.
+    """
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be at least 1")
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be at least 0 and smaller than max_tokens")
+    ratio = chars_per_token(model)
+    # Token estimates are linear in length, so the budget can be enforced in characters
+    max_chars = max(1, math.floor(max_tokens * ratio))
+    overlap_chars = math.floor(overlap_tokens * ratio)
+
+    pieces = []
+    length = 0
+    fresh = False  # Whether the current chunk holds anything besides overlap
+
+    for separator, text in _iter_pieces(content, max_chars):
+        added = len(text) + (len(separator) if pieces else 0)
+        if pieces and length + added > max_chars:
+            if fresh:
+                yield _join(pieces)
+            pieces, length = _overlap(pieces, overlap_chars)
+            # Drop overlap from the front until the new piece fits
+            while pieces and length + len(separator) + len(text) > max_chars:
+                dropped = pieces.pop(0)
+                length -= len(dropped[1])
+                if pieces:
+                    length -= len(pieces[0][0])
+            added = len(text) + (len(separator) if pieces else 0)
+        pieces.append((separator, text))
+        length += added
+        fresh = True
+
+    if pieces and fresh:
+        yield _join(pieces)
+
+
+def _join(pieces):
+    return pieces[0][1] + "".join(separator + text for separator, text in pieces[1:])
+
+
+def _overlap(pieces, overlap_chars):
+    """Trailing pieces of the finished chunk whose joined length fits in `overlap_chars`"""
+    if overlap_chars <= 0:
+        return [], 0
+    kept = []
+    length = 0
+    for separator, text in reversed(pieces):
+        extra = len(text) + (len(kept[0][0]) if kept else 0)
+        if length + extra > overlap_chars:
+            break
+        kept.insert(0, (separator, text))
+        length += extra
+    return kept, length
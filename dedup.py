@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from array import array
+from dotenv import load_dotenv
+import threading
+import hashlib
+import metrics
+import re
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Estimated Jaccard similarity above which two chunks count as the same
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+# Words per shingle
+DEFAULT_SHINGLE_SIZE = 5
+# Chunks remembered before the oldest are forgotten
+DEFAULT_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_CHUNKS", "50000"))
+
+_WORD_RE = re.compile(r'\w+')
+# Bits of each shingle hash kept as the MinHash value; the rest of the
+# 64 bits leave room to offset values copied into empty bins
+_VALUE_BITS = 48
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+
+def shingles(text, size=DEFAULT_SHINGLE_SIZE):
+    """The set of `size`-word shingles of `text`, lowercased; short texts give a single shingle"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _lsh_params(threshold, num_perm):
+    """
+    Pick `rows` per band so that the LSH S-curve, roughly (1/bands)^(1/rows),
+    rises just below `threshold`: pairs near the threshold are still compared
+    rather than missed.
+    """
+    best = 1
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = rows
+    return num_perm // best, best
+
+
+class ChunkDeduplicator:
+    """
+    Finds near-duplicate chunks across the pages it has seen, such as
+    headers, footers, menus and cookie banners repeated by a site. Only the
+    last `max_entries` chunks are remembered; older ones are forgotten first.
+
+    Each chunk is reduced to a MinHash signature of its word shingles, using
+    one hash per shingle spread over `num_perm` bins (one-permutation hashing
+    with densification, so long chunks cost no more than hashing their
+    shingles once). Signatures are indexed with banded locality-sensitive
+    hashing, so finding candidates doesn't compare a chunk with every other
+    one. Candidates whose estimated Jaccard similarity reaches `threshold`
+    are duplicates.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be greater than 0 and at most 1")
+        if not 1 <= num_perm < 1 << (64 - _VALUE_BITS):
+            raise ValueError(f"num_perm must be between 1 and {(1 << (64 - _VALUE_BITS)) - 1}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self.skipped = 0
+        # id -> (signature, source), oldest first
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._buckets = {}
+        self._indexed = {}
+        self._lock = threading.Lock()
+
+    def signature(self, chunk):
+        """MinHash signature of `chunk`, or None when it has no words"""
+        hashed = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for shingle in shingles(chunk, self.shingle_size)
+        ]
+        if not hashed:
+            return None
+        empty = (1 << 64) - 1
+        bins = array("Q", [empty]) * self.num_perm
+        for h in hashed:
+            slot = h % self.num_perm
+            value = (h >> 16) & _VALUE_MASK
+            if value < bins[slot]:
+                bins[slot] = value
+        # Fill each empty bin from the next filled one, offset by the distance,
+        # so chunks with few shingles still get comparable signatures
+        filled = [i for i in range(self.num_perm) if bins[i] != empty]
+        if len(filled) < self.num_perm:
+            following = filled[0] + self.num_perm
+            for i in range(self.num_perm - 1, -1, -1):
+                if bins[i] != empty:
+                    following = i
+                    continue
+                distance = following - i
+                bins[i] = bins[following % self.num_perm] + (distance << _VALUE_BITS)
+        return bins
+
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(a == b for a, b in zip(first, second)) / self.num_perm
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows].tobytes()
+
+    def _best_match(self, signature, exclude_source):
+        """The most similar indexed signature from another source, as (id, similarity), or (None, 0.0)"""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            indexed, source = self._entries[candidate]
+            if exclude_source is not None and source == exclude_source:
+                continue
+            similarity = self.similarity(signature, indexed)
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return best, best_similarity
+
+    def _index(self, signature, source):
+        # Filtering the same page again shouldn't grow the index
+        fingerprint = (source, signature.tobytes())
+        if fingerprint in self._indexed:
+            return
+        entry = self._next_id
+        self._next_id += 1
+        self._indexed[fingerprint] = entry
+        self._entries[entry] = (signature, source)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry)
+        while len(self._entries) > self.max_entries:
+            self._forget_oldest()
+
+    def _forget_oldest(self):
+        entry, (signature, source) = self._entries.popitem(last=False)
+        del self._indexed[(source, signature.tobytes())]
+        for key in self._band_keys(signature):
+            bucket = self._buckets[key]
+            bucket.discard(entry)
+            if not bucket:
+                del self._buckets[key]
+
+    def filter(self, chunks, source=None, report=False):
+        """
+        Drop the chunks that nearly duplicate a chunk seen earlier, either on
+        another page or earlier in `chunks`, and remember the rest. Chunks
+        are only compared with those of other sources, so filtering the same
+        page (`source`, usually its URL) again keeps its chunks. Kept chunks
+        stay in order.
+
+        With `report=True` a list of skipped chunks ({"index", "similarity",
+        "duplicate_of", "preview"}) is returned alongside the kept ones.
+        """
+        chunks = list(chunks)
+        signatures = [self.signature(chunk) for chunk in chunks]
+        kept = []
+        skipped = []
+        with self._lock:
+            local = ChunkDeduplicator(self.threshold, self.num_perm, self.shingle_size)
+            for i, (chunk, signature) in enumerate(zip(chunks, signatures)):
+                if signature is None:
+                    kept.append(chunk)
+                    continue
+                match, similarity = self._best_match(signature, exclude_source=source)
+                duplicate_of = self._entries[match][1] if match is not None else None
+                if similarity < self.threshold:
+                    # Repeats within the page itself
+                    match, similarity = local._best_match(signature, exclude_source=None)
+                    duplicate_of = source
+                if similarity >= self.threshold:
+                    skipped.append({
+                        "index": i,
+                        "similarity": round(similarity, 3),
+                        "duplicate_of": duplicate_of,
+                        "preview": chunk[:120],
+                    })
+                    continue
+                local._index(signature, source)
+                kept.append(chunk)
+            for signature, _ in local._entries.values():
+                self._index(signature, source)
+            self.skipped += len(skipped)
+
+        metrics.incr("duplicate_chunks", len(skipped))
+        logging.info(f"Near-duplicate filter kept {len(kept)} of {len(chunks)} chunks.")
+        if not report:
+            return kept
+        return kept, skipped
+
+    def stats(self):
+        with self._lock:
+            return {"indexed": len(self._entries), "skipped": self.skipped}
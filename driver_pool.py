@@ -0,0 +1,270 @@
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from webdriver_manager.chrome import ChromeDriverManager
+from render_profiles import get_profile
+from contextlib import contextmanager
+from collections import deque
+from dotenv import load_dotenv
+import metrics
+import threading
+import atexit
+import time
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Pool defaults, overridable through the environment (see sample.env)
+DEFAULT_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "2"))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("SCRAPER_POOL_IDLE_TIMEOUT", "300"))
+DEFAULT_MAX_PAGES = int(os.getenv("SCRAPER_POOL_MAX_PAGES", "50"))
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_chromedriver_path():
+    """Resolve the ChromeDriver binary once per process and reuse the cached path"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            # An explicit path skips WebDriver Manager's version lookup entirely
+            _driver_path = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+            logging.info(f"Using ChromeDriver at {_driver_path}")
+        return _driver_path
+
+
+class PooledDriver:
+    """A Chrome session owned by a DriverPool, with the bookkeeping needed to recycle it"""
+
+    def __init__(self, driver, profile=None):
+        self.driver = driver
+        self.profile = profile
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.pages = 0
+
+
+class DriverPool:
+    """
+    A bounded pool of warm Chrome sessions.
+
+    Sessions are started lazily up to `size`, handed out with `acquire()` and
+    given back with `release()`. Returned sessions are health-checked before
+    reuse, closed after `idle_timeout` seconds without work and recycled after
+    serving `max_pages` pages so long-running browsers don't accumulate memory.
+
+    Every session is started with a render profile (see render_profiles.py).
+    Sessions of all profiles share the `size` limit; when a profile has no idle
+    session and the pool is full, an idle session of another profile is closed
+    to make room. `options_factory`, if given, replaces the profile's options.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 max_pages=DEFAULT_MAX_PAGES, options_factory=None, profile=None):
+        if size < 1:
+            raise ValueError("Driver pool size must be at least 1")
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_pages = max_pages
+        self.options_factory = options_factory
+        self.profile = profile
+        self._idle = deque()
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # The reaper sleeps on its own event so wakeups meant for acquire() aren't lost to it
+        self._stop_reaper = threading.Event()
+        self._reaper = None
+
+    def _resolve_profile(self, profile):
+        if profile is None:
+            profile = self.profile
+        return get_profile(profile) if profile is None or isinstance(profile, str) else profile
+
+    def _create_driver(self, profile):
+        logging.info(f"Starting a new pooled Chrome session ({profile.name} profile)...")
+        with metrics.span("driver_startup", profile=profile.name):
+            service = Service(get_chromedriver_path())
+            options = self.options_factory() if self.options_factory else profile.options()
+            driver = webdriver.Chrome(service=service, options=options)
+        try:
+            profile.apply(driver)
+            driver.implicitly_wait(10)  # Wait up to 10 seconds for elements to be available
+        except Exception:
+            driver.quit()
+            raise
+        return PooledDriver(driver, profile.name)
+
+    def _quit(self, session):
+        try:
+            session.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error while closing pooled Chrome session: {e}")
+
+    def _is_healthy(self, session):
+        try:
+            session.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            logging.warning(f"Pooled Chrome session failed health check: {e}")
+            return False
+
+    def _pop_expired(self):
+        """Remove idle sessions past their idle timeout; caller must hold the lock"""
+        expired = []
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft())
+        self._total -= len(expired)
+        if expired:
+            self._cond.notify_all()
+        return expired
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="driver-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(self.idle_timeout / 2, 1)
+        while not self._stop_reaper.wait(interval):
+            with self._cond:
+                if self._closed:
+                    return
+                expired = self._pop_expired()
+            for session in expired:
+                logging.info("Closing idle pooled Chrome session...")
+                self._quit(session)
+
+    def _pop_idle(self, profile_name):
+        """Most recently used idle session of the profile, so surplus sessions age out; caller must hold the lock"""
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].profile == profile_name:
+                session = self._idle[i]
+                del self._idle[i]
+                return session
+        return None
+
+    def acquire(self, timeout=None, profile=None):
+        """
+        Borrow a session rendering with `profile` (a RenderProfile or its name; the
+        pool's profile by default), starting a new one if the pool has room.
+        Blocks while all sessions are in use.
+        """
+        profile = self._resolve_profile(profile)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                expired = self._pop_expired()
+                session = self._pop_idle(profile.name)
+                if session is None:
+                    if self._total < self.size:
+                        self._total += 1
+                        create = True
+                    elif self._idle:
+                        # Full, but a session of another profile is idle: replace the least recently used one
+                        expired.append(self._idle.popleft())
+                        create = True
+                    else:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            raise TimeoutError("Timed out waiting for a free Chrome session")
+                        self._cond.wait(remaining)
+                self._start_reaper()
+            for old in expired:
+                self._quit(old)
+
+            if create:
+                try:
+                    return self._create_driver(profile)
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+            if session is not None:
+                if self._is_healthy(session):
+                    return session
+                self._discard(session)
+
+    def _discard(self, session):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        self._quit(session)
+
+    def release(self, session, discard=False):
+        """Return a borrowed session; broken or worn-out sessions are closed instead of reused"""
+        session.pages += 1
+        if discard or self._closed or session.pages >= self.max_pages:
+            if not discard and session.pages >= self.max_pages:
+                logging.info(f"Recycling Chrome session after {session.pages} pages...")
+            self._discard(session)
+            return
+        try:
+            # Don't leak cookies or the previous page between borrowers
+            session.driver.delete_all_cookies()
+            session.driver.get("about:blank")
+        except Exception as e:
+            logging.warning(f"Could not reset pooled Chrome session, discarding it: {e}")
+            self._discard(session)
+            return
+        session.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self, timeout=None, profile=None):
+        """
+        Context manager yielding a WebDriver that is returned to the pool
+        afterwards. Only a browser error closes the session; after a slow or
+        broken page it goes back to the pool, where release() resets it.
+        """
+        session = self.acquire(timeout=timeout, profile=profile)
+        discard = False
+        try:
+            yield session.driver
+        except TimeoutException:
+            # A page that loads too slowly says nothing about the browser
+            raise
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.release(session, discard=discard)
+
+    def close(self):
+        """Close every idle session and stop handing out new ones"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        self._stop_reaper.set()
+        for session in idle:
+            self._quit(session)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Process-wide pool shared by every caller that doesn't bring its own"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = DriverPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
@@ -0,0 +1,123 @@
+from lxml import etree
+import re
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Elements whose text never belongs in the extracted content
+SKIP_TAGS = frozenset([
+    'head', 'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object',
+    'nav', 'footer', 'aside', 'dialog',
+    # Form controls; the form itself often wraps the whole page (ASP.NET WebForms, many CMSs)
+    'input', 'button', 'select', 'option', 'textarea',
+])
+
+# Elements that start a new line in the output
+BLOCK_TAGS = frozenset([
+    'p', 'div', 'section', 'article', 'main', 'header', 'br', 'hr', 'ul', 'ol', 'dl', 'dt', 'dd',
+    'table', 'thead', 'tbody', 'tfoot', 'caption', 'blockquote', 'pre', 'figure', 'figcaption',
+    'address', 'details', 'summary',
+])
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+FEED_SIZE = 64 * 1024
+
+_SPACES_RE = re.compile(r'[ \t\r\f\v\xa0]+')
+
+
+class _TextCollector:
+    """
+    lxml parser target that turns start/end/data events into text as they arrive.
+
+    No tree is built, so memory stays bounded by the size of the output rather
+    than the size of the DOM.
+    """
+
+    def __init__(self, keep_structure=True):
+        self.keep_structure = keep_structure
+        self.parts = []
+        self.skip_depth = 0
+        self.cells_in_row = 0
+
+    def _skip(self, tag, attrib):
+        if tag in SKIP_TAGS:
+            return True
+        if attrib.get('hidden') is not None or attrib.get('aria-hidden') == 'true':
+            return True
+        return attrib.get('role') in ('navigation', 'banner', 'contentinfo', 'dialog')
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str):
+            return
+        tag = tag.lower()
+        if self.skip_depth or self._skip(tag, attrib):
+            self.skip_depth += 1
+            return
+        if not self.keep_structure:
+            if tag in ('td', 'th'):
+                self.parts.append(' ')
+            elif tag in BLOCK_TAGS or tag in HEADING_TAGS or tag in ('li', 'tr'):
+                self.parts.append('\n')
+            return
+        if tag in HEADING_TAGS:
+            self.parts.append('\n' + '#' * HEADING_TAGS[tag] + ' ')
+        elif tag == 'li':
+            self.parts.append('\n- ')
+        elif tag == 'tr':
+            self.parts.append('\n')
+            self.cells_in_row = 0
+        elif tag in ('td', 'th'):
+            if self.cells_in_row:
+                self.parts.append(' | ')
+            self.cells_in_row += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def end(self, tag):
+        if not isinstance(tag, str):
+            return
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+        tag = tag.lower()
+        if tag in BLOCK_TAGS or tag in HEADING_TAGS or tag in ('li', 'tr'):
+            self.parts.append('\n')
+
+    def data(self, text):
+        if not self.skip_depth:
+            self.parts.append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        lines = (_SPACES_RE.sub(' ', line).strip() for line in ''.join(self.parts).split('\n'))
+        # Drop empty lines and list/heading markers left without any text
+        return '\n'.join(line for line in lines if line and line not in ('-', '|') and line.strip('#'))
+
+
+def extract_text(html, keep_structure=True, encoding=None):
+    """
+    Extract the readable text of an HTML document in one streaming pass.
+
+    `html` may be a string, bytes, or an iterable of string/bytes pieces (for
+    example a streamed HTTP response). Scripts, styles, navigation, footers and
+    other non-content elements are dropped. With `keep_structure`, headings are
+    prefixed with '#', list items with '- ' and table cells are joined with ' | '.
+    Pass `encoding` when feeding bytes whose charset isn't declared in the page.
+    """
+    parser = etree.HTMLParser(target=_TextCollector(keep_structure), remove_comments=True, encoding=encoding)
+    if isinstance(html, (str, bytes)):
+        for start in range(0, len(html), FEED_SIZE):
+            parser.feed(html[start:start + FEED_SIZE])
+    else:
+        for piece in html:
+            if piece:
+                parser.feed(piece)
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        # Nothing was fed (empty document)
+        return ''
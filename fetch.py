@@ -0,0 +1,207 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
+from collections import namedtuple
+from scrape import scrape_website
+import metrics
+import requests
+import threading
+import re
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "15"))
+USER_AGENT = os.getenv(
+    "SCRAPER_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+
+# Pages with less visible text than this are assumed to be rendered client-side
+MIN_TEXT_LENGTH = 200
+
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BODY_RE = re.compile(r'<body\b[^>]*>(.*)', re.IGNORECASE | re.DOTALL)
+_NOSCRIPT_RE = re.compile(r'<noscript\b[^>]*>(.*?)</noscript\s*>', re.IGNORECASE | re.DOTALL)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+# Known single-page-app mount points left empty in the server response
+_EMPTY_SPA_ROOT_RE = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte|main-app)["\'][^>]*>\s*</div>',
+    re.IGNORECASE
+)
+_JS_REQUIRED_MARKERS = (
+    "enable javascript",
+    "javascript is required",
+    "requires javascript",
+    "javascript is disabled",
+    "turn on javascript",
+    "javascript must be enabled",
+)
+
+# Outcome of a conditional fetch: the page HTML (None when not_modified) and the
+# validators to send the next time the page is revalidated
+FetchResult = namedtuple("FetchResult", ["html", "not_modified", "etag", "last_modified"])
+
+_session = None
+_session_lock = threading.Lock()
+# Per-host decision: "http" when plain GETs have worked, "browser" once a page needed JavaScript
+_host_modes = {}
+_host_modes_lock = threading.Lock()
+
+
+def get_http_session():
+    """Shared keep-alive session so repeat requests to a host reuse pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                          allowed_methods=("GET", "HEAD"))
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9",
+            })
+            _session = session
+        return _session
+
+
+def needs_javascript(html, min_text_length=MIN_TEXT_LENGTH):
+    """Heuristically decide whether a server response must be rendered in a browser to be useful"""
+    body_match = _BODY_RE.search(html)
+    if body_match is None:
+        return True
+    body = body_match.group(1)
+
+    if _EMPTY_SPA_ROOT_RE.search(body):
+        return True
+
+    for noscript in _NOSCRIPT_RE.findall(body):
+        noscript_lower = noscript.lower()
+        if any(marker in noscript_lower for marker in _JS_REQUIRED_MARKERS):
+            return True
+
+    visible_text = _TAG_RE.sub(" ", _SCRIPT_STYLE_RE.sub(" ", body))
+    return len("".join(visible_text.split())) < min_text_length
+
+
+def _decode(response):
+    # requests falls back to ISO-8859-1 for text/* without a charset; sniff the meta tag instead
+    if "charset" not in response.headers.get("Content-Type", "").lower():
+        match = _META_CHARSET_RE.search(response.content[:4096])
+        response.encoding = match.group(1).decode("ascii") if match else "utf-8"
+    return response.text
+
+
+def get_host_mode(url):
+    with _host_modes_lock:
+        return _host_modes.get(urlsplit(url).netloc)
+
+
+def set_host_mode(url, mode):
+    with _host_modes_lock:
+        _host_modes[urlsplit(url).netloc] = mode
+
+
+def _get(url, timeout=HTTP_TIMEOUT, headers=None):
+    with metrics.span("http_fetch", url=url) as fetch_span:
+        response = get_http_session().get(url, timeout=timeout, headers=headers)
+        fetch_span.set(status=response.status_code, bytes=len(response.content))
+    metrics.incr("http_bytes", len(response.content))
+    return response
+
+
+def _usable_html(response):
+    """The response body as text, or None when it isn't an HTML page"""
+    content_type = response.headers.get("Content-Type", "").lower()
+    if response.status_code >= 400:
+        logging.info(f"HTTP fetch returned status {response.status_code}, falling back to browser...")
+        return None
+    if "html" not in content_type:
+        logging.info(f"HTTP fetch returned non-HTML content ({content_type}), falling back to browser...")
+        return None
+    return _decode(response)
+
+
+def fetch_http(url, timeout=HTTP_TIMEOUT):
+    """
+    Fetch `url` with a plain GET. Returns the HTML, or None when the response
+    isn't usable without a browser.
+    """
+    return _usable_html(_get(url, timeout=timeout))
+
+
+def fetch_page(website, wait=5, wait_strategy=None, pool=None, force_browser=False, profile=None):
+    """
+    Fetch `website`, trying a pooled HTTP GET first and escalating to a full
+    Chrome render only when the page looks like it needs JavaScript.
+    """
+    mode = "browser" if force_browser else get_host_mode(website)
+    if mode != "browser":
+        logging.info("Fetching website over HTTP...")
+        try:
+            html = fetch_http(website)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"HTTP fetch failed, falling back to browser: {e}")
+            html = None
+        if html is not None:
+            if not needs_javascript(html):
+                set_host_mode(website, "http")
+                logging.info("Page is server-rendered, skipping the browser.")
+                return html
+            # Remember the decision so later pages on this host go straight to Chrome
+            logging.info("Page needs JavaScript, rendering it in the browser...")
+            set_host_mode(website, "browser")
+    return scrape_website(website, wait=wait, wait_strategy=wait_strategy, pool=pool, profile=profile)
+
+
+def fetch_page_conditional(website, etag=None, last_modified=None, wait=5, wait_strategy=None,
+                           pool=None, force_browser=False, profile=None):
+    """
+    Like fetch_page, but revalidates the page with the ETag/Last-Modified
+    validators from an earlier fetch. Returns a FetchResult; when the server
+    answers 304 Not Modified, no HTML is downloaded.
+
+    Pages that are rendered in Chrome are never revalidated: their server
+    response (often an unchanging app shell) says nothing about the content
+    scripts load, so they are always rendered and no validators are returned.
+    """
+    mode = "browser" if force_browser else get_host_mode(website)
+    if mode != "browser":
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = None
+        try:
+            logging.info("Revalidating website over HTTP..." if headers else "Fetching website over HTTP...")
+            response = _get(website, headers=headers)
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"HTTP fetch failed, falling back to browser: {e}")
+
+        if response is not None:
+            if response.status_code == 304:
+                logging.info("Page not modified since the last scrape.")
+                metrics.incr("not_modified")
+                return FetchResult(None, True, response.headers.get("ETag") or etag,
+                                   response.headers.get("Last-Modified") or last_modified)
+            html = _usable_html(response)
+            if html is not None:
+                if not needs_javascript(html):
+                    set_host_mode(website, "http")
+                    logging.info("Page is server-rendered, skipping the browser.")
+                    return FetchResult(html, False, response.headers.get("ETag"),
+                                       response.headers.get("Last-Modified"))
+                logging.info("Page needs JavaScript, rendering it in the browser...")
+                set_host_mode(website, "browser")
+
+    html = scrape_website(website, wait=wait, wait_strategy=wait_strategy, pool=pool, profile=profile)
+    return FetchResult(html, False, None, None)
@@ -0,0 +1,175 @@
+from dotenv import load_dotenv
+import sqlite3
+import threading
+import hashlib
+import json
+import time
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Writes between eviction passes, so a write doesn't pay for scanning the whole cache
+EVICT_EVERY = 100
+# Keys looked up per query, below SQLite's limit on bound parameters
+LOOKUP_BATCH = 500
+
+
+def make_cache_key(chunk, parse_description, model_name, template, temperature):
+    """Content-addressed key: any change to the chunk, question, model or prompt gives a new entry"""
+    payload = json.dumps([chunk, parse_description, model_name, template, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    On-disk cache of LLM extraction results, stored in SQLite.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the cache holds more than `max_entries`. Eviction runs in a
+    batch every `evict_every` writes, so the cache can briefly hold that many
+    extra entries. Hit and miss counts are kept for the lifetime of the object.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 evict_every=EVICT_EVERY):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_last_access ON extractions (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_created_at ON extractions (created_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss or an expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def get_many(self, keys):
+        """Look up several keys at once; returns {key: value} for the hits"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        expired = []
+        with self._lock:
+            # One query and one commit for the whole page instead of one per chunk
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, value, created_at FROM extractions WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self.ttl and now - created_at > self.ttl:
+                        expired.append((key,))
+                    else:
+                        found[key] = value
+            if expired:
+                self._conn.executemany("DELETE FROM extractions WHERE key = ?", expired)
+            if found:
+                self._conn.executemany("UPDATE extractions SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+            if expired or found:
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._writes += 1
+            if self._writes >= self.evict_every:
+                self._evict()
+                self._writes = 0
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries and the least recently used ones above max_entries; caller must hold the lock"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM extractions WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM extractions WHERE key IN "
+                "(SELECT key FROM extractions ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache, or None when LLM_CACHE_PATH is set to an empty value"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None and DEFAULT_CACHE_PATH:
+            try:
+                _default_cache = ExtractionCache()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open the LLM cache at {DEFAULT_CACHE_PATH}: {e}")
+        return _default_cache
@@ -1,13 +1,16 @@
 import streamlit as st
-from scrape import (
-    scrape_website,
-    extract_body_content,
-    clean_body_content,
-    split_dom_content
-)
-from parse import parse_with_ollama
+from parse import warm_up_model, DEFAULT_CONCURRENCY, OLLAMA_MODEL
+from snapshots import get_default_store
+from dedup import DEFAULT_THRESHOLD
+from chunking import DEFAULT_CHUNK_TOKENS
+from driver_pool import DriverPool
+from render_profiles import PROFILES
+from service import ScraperService, ServiceClient, ServiceBusy, LLM_WORKERS, INTERACTIVE_PRIORITY
+import metrics
 import logging
 import argparse
+import uuid
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,10 +19,106 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 parser = argparse.ArgumentParser(description='AI Web Scraper')
 parser.add_argument('--url', type=str, help='The URL of the website to scrape')
 parser.add_argument('--output', type=str, help='The name of the output file to save the scraped content')
-parser.add_argument('--wait', type=int, default=5, help='The number of seconds to wait for the page to load')
-parser.add_argument('--model', type=str, default='llama3', help='The name of the Ollama model to use for parsing')
+parser.add_argument('--wait', type=float, default=5, help='The maximum number of seconds to wait for the page to load')
+parser.add_argument('--wait-for', type=str, default=None,
+                    help='Comma-separated page-readiness checks: readystate, network-idle, dom-quiet, selector:<css>')
+parser.add_argument('--model', type=str, default=OLLAMA_MODEL, help='The name of the Ollama model to use for parsing')
+parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_CONCURRENCY, help='The number of chunks sent to Ollama at once')
+parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS, help='The maximum number of tokens per chunk sent to Ollama')
+parser.add_argument('--chunk-overlap', type=int, default=0, help='The number of tokens each chunk repeats from the end of the previous one')
+parser.add_argument('--top-k', type=int, default=8, help='Send only the k chunks most related to the description to Ollama (0 sends every chunk)')
+parser.add_argument('--min-score', type=float, default=0.0, help='Skip chunks whose relevance score is not above this value')
+parser.add_argument('--dedup-threshold', type=float, default=0.0,
+                    help=f'Skip chunks at least this similar to a chunk already parsed from another page in this session '
+                         f'for the same description, e.g. {DEFAULT_THRESHOLD} (default: 0, keep them all)')
+parser.add_argument('--no-cache', action='store_true', help='Always send chunks to Ollama instead of reusing cached extractions')
+parser.add_argument('--no-snapshots', action='store_true',
+                    help='Re-scrape and re-parse pages in full instead of reusing what is unchanged since the last scrape')
+parser.add_argument('--no-stream', action='store_true', help='Show the parsed result only once every chunk is done')
+parser.add_argument('--force-browser', action='store_true', help='Always render pages in Chrome instead of trying a plain HTTP fetch first')
+parser.add_argument('--render-profile', type=str, default=None, choices=sorted(PROFILES),
+                    help='How Chrome renders pages for hosts without a profile of their own (default: SCRAPER_RENDER_PROFILE)')
+parser.add_argument('--pool-size', type=int, default=2, help='The maximum number of Chrome sessions kept warm for scraping')
+parser.add_argument('--llm-workers', type=int, default=LLM_WORKERS,
+                    help='The number of parse jobs run at once across every user of the app')
+parser.add_argument('--service', type=str, default=None,
+                    help='URL of a running service (python service.py) to send jobs to instead of running them in the app')
+parser.add_argument('--metrics', action='store_true', help='Collect per-stage timings and show them in the sidebar')
+parser.add_argument('--trace-file', type=str, help='Append a JSON line per timed stage to this file (implies --metrics)')
+parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port (implies --metrics)')
 args = parser.parse_args()
 
+if args.metrics or args.trace_file or args.metrics_port:
+    metrics.enable(args.trace_file)
+
+
+# Shared across every session and rerun, so all users queue on the same bounded
+# browser and LLM worker pools instead of each starting their own
+@st.cache_resource
+def get_service(service_url, pool_size, llm_workers, use_snapshots):
+    if service_url:
+        return ServiceClient(service_url)
+    return ScraperService(
+        scrape_workers=pool_size,
+        llm_workers=llm_workers,
+        pool=DriverPool(size=pool_size),
+        snapshots=get_default_store() if use_snapshots else None
+    )
+
+
+def write_stream(pieces, refresh_interval=0.1):
+    """Render streamed text as it arrives and return the full text"""
+    if hasattr(st, "write_stream"):
+        return st.write_stream(pieces)
+    # Older Streamlit: redraw a placeholder, throttled so long answers don't re-render per token
+    placeholder = st.empty()
+    parts = []
+    last_refresh = 0.0
+    for piece in pieces:
+        parts.append(piece)
+        if time.monotonic() - last_refresh >= refresh_interval:
+            placeholder.markdown("".join(parts))
+            last_refresh = time.monotonic()
+    text = "".join(parts)
+    placeholder.markdown(text)
+    return text
+
+
+def text_pieces(events, skipped):
+    """The text of a parse job's events as they arrive; "skipped" events are collected in `skipped`"""
+    for event in events:
+        if event["type"] == "text":
+            yield event["text"]
+        elif event["type"] == "skipped":
+            skipped.append(event)
+
+
+def finished_result(service, job_id):
+    """Return the result of a finished job, raising if it failed or was cancelled"""
+    job = service.get_job(job_id)
+    if job["status"] != "done":
+        raise RuntimeError(job["error"] or f"The {job['kind']} job was {job['status']}")
+    return job["result"]
+
+
+# Started once per process; Streamlit reruns reuse the running server
+@st.cache_resource
+def start_metrics_server(port):
+    return metrics.start_http_server(port)
+
+
+if args.metrics_port:
+    start_metrics_server(args.metrics_port)
+
+# Load the model on the Ollama server in the background; returns immediately and only runs once per process
+warm_up_model(args.model)
+
+service = get_service(args.service, args.pool_size, args.llm_workers, not args.no_snapshots)
+
+# Near-duplicate chunks are only skipped against pages parsed earlier in the same session
+if "dedup_scope" not in st.session_state:
+    st.session_state.dedup_scope = uuid.uuid4().hex
+
 # Streamlit UI
 st.title("AI Web Scraper")
 url = st.text_input("Enter Website URL", value=args.url if args.url else "")
@@ -27,17 +126,33 @@ url = st.text_input("Enter Website URL", value=args.url if args.url else "")
 # Step 1: Scrape the Website
 if st.button("Scrape Website"):
     if url:
-        with st.status("Scraping the website...", expanded=True) as status:
+        with st.status("Waiting for a free browser...", expanded=True) as status:
             try:
-                # Scrape the website
-                dom_content = scrape_website(url, wait=args.wait)
-                status.update(label="Extracting body content...", state="running")
-                body_content = extract_body_content(dom_content)
-                status.update(label="Cleaning body content...", state="running")
-                cleaned_content = clean_body_content(body_content)
+                job = service.submit_scrape(
+                    url,
+                    priority=INTERACTIVE_PRIORITY,
+                    wait=args.wait,
+                    wait_for=args.wait_for,
+                    force_browser=args.force_browser,
+                    render_profile=args.render_profile,
+                    chunk_tokens=args.chunk_tokens,
+                    chunk_overlap=args.chunk_overlap,
+                    model=args.model
+                )
+                for event in service.iter_events(job["id"]):
+                    if event["type"] == "status":
+                        status.update(label=event["message"], state="running")
+                result = finished_result(service, job["id"])
 
-                # Store the DOM content in Streamlit session state
-                st.session_state.dom_content = cleaned_content
+                # Keep only references to the stored page; the service holds the content and chunks
+                st.session_state.document_id = result["document_id"]
+                st.session_state.chunks_id = result["chunks_id"]
+                if result["not_modified"]:
+                    st.write("The page hasn't changed since the last scrape.")
+                else:
+                    st.write(f"{result['changed_chunks']} of {result['chunks']} chunks changed since the last scrape.")
+
+                cleaned_content = service.get_document(result["document_id"])["content"]
 
                 # Display the DOM content in an expandable text box
                 with st.expander("View DOM Content"):
@@ -51,6 +166,9 @@ if st.button("Scrape Website"):
                     st.write(f"Scraped content saved to {args.output}")
 
                 status.update(label="Scraping completed!", state="complete")
+            except ServiceBusy as e:
+                st.warning(f"The scraper is busy, please try again in a moment: {e}")
+                status.update(label="Scraper busy", state="error")
             except Exception as e:
                 st.error(f"An error occurred while scraping the website: {e}")
                 logging.error(f"An error occurred while scraping the website: {e}")
@@ -58,19 +176,62 @@ if st.button("Scrape Website"):
 
 
 # Step 2: Ask Questions About the DOM Content
-if "dom_content" in st.session_state:
+if "chunks_id" in st.session_state:
     parse_description = st.text_area("Describe what you want to parse")
 
     if st.button("Parse Content"):
         if parse_description:
-            with st.status("Parsing the content...", expanded=True) as status:
+            with st.status("Waiting for the model...", expanded=True) as status:
                 try:
-                    # Parse the content with Ollama
-                    dom_chunks = split_dom_content(st.session_state.dom_content)
-                    parsed_result = parse_with_ollama(dom_chunks, parse_description, model=args.model)
-                    st.write(parsed_result)
+                    # The chunks were split and stored once, when the page was scraped
+                    job = service.submit_parse(
+                        st.session_state.chunks_id,
+                        parse_description,
+                        priority=INTERACTIVE_PRIORITY,
+                        model=args.model,
+                        top_k=args.top_k,
+                        min_score=args.min_score,
+                        dedup_threshold=args.dedup_threshold,
+                        dedup_scope=st.session_state.dedup_scope,
+                        use_cache=not args.no_cache,
+                        max_workers=args.llm_concurrency
+                    )
+                    skipped = []
+                    if args.no_stream:
+                        for _ in text_pieces(service.iter_events(job["id"]), skipped):
+                            pass
+                        st.write(finished_result(service, job["id"])["text"])
+                    else:
+                        # Show each chunk's answer as soon as its tokens arrive
+                        parsed_result = write_stream(text_pieces(service.iter_events(job["id"]), skipped))
+                        finished_result(service, job["id"])
+                        if not parsed_result:
+                            st.write("No results were found.")
+
+                    for event in skipped:
+                        reason = "near-duplicates" if event["reason"] == "duplicate" else "unrelated"
+                        with st.expander(f"Skipped {len(event['chunks'])} of {event['total']} chunks as {reason}"):
+                            st.table(event["chunks"])
                     status.update(label="Parsing completed!", state="complete")
+                except KeyError:
+                    st.error("The scraped page is no longer stored, please scrape it again.")
+                    status.update(label="Parsing failed!", state="error")
+                except ServiceBusy as e:
+                    st.warning(f"The model is busy, please try again in a moment: {e}")
+                    status.update(label="Model busy", state="error")
                 except Exception as e:
                     st.error(f"An error occurred while parsing the content: {e}")
                     logging.error(f"An error occurred while parsing the content: {e}")
                     status.update(label="Parsing failed!", state="error")
+
+
+# Performance summary
+if metrics.is_enabled():
+    with st.sidebar:
+        st.subheader("Performance")
+        performance = metrics.summary()
+        if performance["stages"]:
+            st.table(performance["stages"])
+            st.json(performance["counters"])
+        else:
+            st.write("No stages timed yet.")
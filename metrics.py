@@ -0,0 +1,212 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+import threading
+import bisect
+import json
+import time
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Histogram bucket upper bounds for stage durations, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+# stage -> [count, total seconds, max seconds, per-bucket counts]
+_timers = {}
+_trace_file = None
+_local = threading.local()
+
+
+class _NullSpan:
+    """Stand-in returned while metrics are disabled, so instrumented code pays almost nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times one pipeline stage and records it in the histograms and the JSON-lines trace"""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+
+    def set(self, **attrs):
+        """Attach extra attributes, e.g. sizes only known once the stage is done"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        _observe(self.name, duration)
+        if _trace_file is not None:
+            event = {
+                "name": self.name,
+                "start": round(self.wall_start, 6),
+                "duration": round(duration, 6),
+                "parent": self.parent,
+                "thread": threading.current_thread().name,
+            }
+            if self.attrs:
+                event["attrs"] = self.attrs
+            if exc_type is not None:
+                event["error"] = repr(exc)
+            _write_trace(event)
+        return False
+
+
+def enable(trace_path=None):
+    """Start collecting metrics, optionally appending every span to a JSON-lines trace file"""
+    global _enabled, _trace_file
+    with _lock:
+        if trace_path and _trace_file is None:
+            _trace_file = open(trace_path, "a", encoding="utf-8", buffering=1)
+        _enabled = True
+
+
+def disable():
+    global _enabled, _trace_file
+    with _lock:
+        _enabled = False
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def span(name, **attrs):
+    """Context manager timing the stage `name`; a no-op while metrics are disabled"""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, attrs)
+
+
+def incr(name, value=1):
+    """Add `value` to the counter `name` (bytes, chunks, tokens, ...)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _observe(name, duration):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+        timer[0] += 1
+        timer[1] += duration
+        timer[2] = max(timer[2], duration)
+        index = bisect.bisect_left(BUCKETS, duration)
+        if index < len(BUCKETS):
+            timer[3][index] += 1
+
+
+def _write_trace(event):
+    line = json.dumps(event, default=str) + "\n"
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.write(line)
+
+
+def summary():
+    """Per-stage timings and counters as plain data, e.g. for a table in the UI"""
+    with _lock:
+        stages = [
+            {
+                "stage": name,
+                "count": count,
+                "total_s": round(total, 3),
+                "mean_ms": round(total / count * 1000, 1) if count else 0.0,
+                "max_ms": round(longest * 1000, 1),
+            }
+            for name, (count, total, longest, _) in sorted(_timers.items())
+        ]
+        counters = dict(sorted(_counters.items()))
+    return {"stages": stages, "counters": counters}
+
+
+def to_prometheus():
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for name, value in sorted(_counters.items()):
+            metric = f"scraper_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        if _timers:
+            lines.append("# TYPE scraper_stage_duration_seconds histogram")
+        for name, (count, total, _, buckets) in sorted(_timers.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'scraper_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'scraper_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'scraper_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'scraper_stage_duration_seconds_count{{stage="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve the Prometheus text format on http://host:port/metrics from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+# Opt in from the environment so batch jobs can be traced without code changes
+if os.getenv("SCRAPER_METRICS", "").lower() in ("1", "true", "yes"):
+    enable(os.getenv("SCRAPER_TRACE_FILE") or None)
@@ -1,5 +1,14 @@
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque, namedtuple
+import queue
+from llm_cache import get_default_cache, make_cache_key
+from dotenv import load_dotenv
+from chunking import estimate_tokens
+import metrics
+import threading
 import requests
 import sys
 import time
@@ -9,9 +18,22 @@ import platform
 import os
 import logging
 
+load_dotenv()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+# Seconds a health check result is reused, and how long a single check may take
+HEALTH_TTL = float(os.getenv("OLLAMA_HEALTH_TTL", "30"))
+HEALTH_TIMEOUT = 2.0
+TEMPERATURE = 0.7
+# How many chunks are sent to Ollama at once; keep in line with the server's OLLAMA_NUM_PARALLEL
+DEFAULT_CONCURRENCY = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+CHUNK_TIMEOUT = 120.0
+CHUNK_RETRIES = 2
+
 template = (
     "You are tasked with extracting specific information from the following text content: {dom_content}. "
     "Please follow these instructions carefully: \n\n"
@@ -127,150 +149,354 @@ def get_ollama_start_instructions():
             "2. If using systemd: systemctl --user start ollama"
         )
 
+# Ollama clients, one per (model, server), created on first use
+_models = {}
+_models_lock = threading.Lock()
+_warming = set()
+
+# Last health check per server: base_url -> (healthy, checked_at)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_ollama_health(base_url=OLLAMA_API_URL, max_age=HEALTH_TTL):
+    """
+    Whether the Ollama server answers, re-checked at most every `max_age` seconds.
+    A single quick request is made when the cached status is stale, so callers never
+    sit through the retries and sleeps of is_ollama_running.
+    """
+    now = time.monotonic()
+    with _health_lock:
+        cached = _health.get(base_url)
+        if cached is not None and now - cached[1] < max_age:
+            return cached[0]
+    try:
+        healthy = requests.get(f"{base_url}/api/version", timeout=HEALTH_TIMEOUT).status_code == 200
+    except requests.exceptions.RequestException:
+        healthy = False
+    if not healthy:
+        logging.warning(f"Ollama server at {base_url} is not running or not accessible.")
+    with _health_lock:
+        _health[base_url] = (healthy, time.monotonic())
+    return healthy
+
+
+def _warm_up(model_name, base_url):
+    try:
+        # An empty prompt makes Ollama load the model into memory without generating anything
+        requests.post(f"{base_url}/api/generate", json={"model": model_name, "prompt": ""}, timeout=CHUNK_TIMEOUT)
+        logging.info(f"Ollama model {model_name} is loaded.")
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Could not warm up Ollama model {model_name}: {e}")
+
+
+def warm_up_model(model_name=None, base_url=OLLAMA_API_URL):
+    """Load the model on the Ollama server in a background thread, once per process"""
+    model_name = model_name or OLLAMA_MODEL
+    with _models_lock:
+        if (model_name, base_url) in _warming:
+            return
+        _warming.add((model_name, base_url))
+
+    def run():
+        if get_ollama_health(base_url):
+            _warm_up(model_name, base_url)
+
+    threading.Thread(target=run, name=f"ollama-warmup-{model_name}", daemon=True).start()
+
+
 # Configure OllamaLLM with explicit connection parameters
-def initialize_ollama_model():
+def get_model(model_name=None, base_url=OLLAMA_API_URL, timeout=CHUNK_TIMEOUT):
+    """
+    Return the shared OllamaLLM client for `model_name`, creating it on first use.
+    Requests that take longer than `timeout` seconds are aborted.
+    Returns None when the Ollama server isn't reachable.
+    """
+    model_name = model_name or OLLAMA_MODEL
+    if not get_ollama_health(base_url):
+        return None
+    with _models_lock:
+        llm = _models.get((model_name, base_url, timeout))
+        if llm is None:
+            logging.info(f"Initializing Ollama model {model_name}...")
+            llm = OllamaLLM(
+                model=model_name,
+                base_url=base_url,
+                temperature=TEMPERATURE,
+                # Passed to the HTTP client, so a timed-out call is closed instead of holding an Ollama slot
+                client_kwargs={"timeout": timeout}
+            )
+            _models[(model_name, base_url, timeout)] = llm
+    warm_up_model(model_name, base_url)
+    return llm
+
+
+def initialize_ollama_model(model_name=None):
     """Initialize the Ollama model with proper error handling"""
     try:
-        # Only initialize the model if Ollama is running
-        if is_ollama_running():
-            try:
-                print("Initializing Ollama model...")
-                model = OllamaLLM(
-                    model="llama3",
-                    base_url="http://localhost:11434",  # Default Ollama API endpoint
-                    temperature=0.7,
-                    request_timeout=120.0  # Increase timeout for larger content processing
-                )
-                # Test the model with a simple query to ensure it's working
-                try:
-                    print("Testing Ollama model connection...")
-                    test_prompt = ChatPromptTemplate.from_template("Say hello")
-                    test_chain = test_prompt | model
-                    test_chain.invoke({})
-                    print("✅ Ollama model initialized and tested successfully.")
-                    return model
-                except Exception as test_error:
-                    print(f"❌ Ollama model test failed: {test_error}")
-                    return None
-            except Exception as init_error:
-                print(f"❌ Error initializing Ollama model: {init_error}")
-                return None
-        else:
-            print("❌ Ollama server is not running, model initialization skipped.")
-            return None
+        return get_model(model_name)
     except Exception as e:
         print(f"❌ Unexpected error during model initialization: {e}")
         return None
 
-# Initialize the model
-model = initialize_ollama_model()
-
 
 # Simple fallback parser when Ollama is not available
-def simple_fallback_parser(dom_chunks, parse_description):
+FALLBACK_MAX_CHARS = 5000
+
+# Words too common to be useful as search terms
+FALLBACK_STOPWORDS = frozenset([
+    'the', 'and', 'that', 'with', 'from', 'this', 'these', 'for', 'are', 'was',
+    'were', 'will', 'have', 'has', 'had', 'not', 'what', 'when', 'where', 'who',
+    'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'some',
+    'such', 'than', 'too', 'very', 'can', 'cannot', 'could', 'may', 'might',
+    'must', 'need', 'ought', 'shall', 'should', 'would'
+])
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|\n')
+
+
+def _extract_key_terms(parse_description):
+    """Pull the search terms out of the parse description"""
+    parse_desc_lower = parse_description.lower()
+    # This is a very basic approach and won't work for complex queries
+    key_terms = [term for term in re.split(r'[,\s\-_]+', parse_desc_lower)
+                 if len(term) > 2 and term not in FALLBACK_STOPWORDS]
+    # If no key terms were found, use the whole description
+    if not key_terms and len(parse_desc_lower.strip()) > 2:
+        key_terms = [parse_desc_lower.strip()]
+    # Keep the first occurrence of each term so term ids follow the description
+    return list(dict.fromkeys(key_terms))
+
+
+def _build_term_matcher(key_terms):
+    """Compile every key term into one case-insensitive alternation, longest terms first"""
+    alternation = "|".join(re.escape(term) for term in sorted(key_terms, key=len, reverse=True))
+    return re.compile(alternation, re.IGNORECASE)
+
+
+def _build_sentence_index(dom_chunks):
+    """Split the whole document into (chunk number, sentence) pairs in a single pass"""
+    index = []
+    for i, chunk in enumerate(dom_chunks):
+        for sentence in _SENTENCE_SPLIT_RE.split(chunk):
+            sentence = sentence.strip()
+            if sentence:
+                index.append((i, sentence))
+    return index
+
+
+def _score_sentences(sentence_index, matcher):
+    """
+    Score each sentence by how many distinct key terms it contains, then by total hits.
+    Every sentence is scanned once by the combined matcher, so this is linear in the document size.
+    """
+    scored = []
+    for position, (chunk_index, sentence) in enumerate(sentence_index):
+        hits = [match.group(0).lower() for match in matcher.finditer(sentence)]
+        if hits:
+            scored.append((len(set(hits)), len(hits), position, chunk_index, sentence))
+    return scored
+
+
+def simple_fallback_parser(dom_chunks, parse_description, max_chars=FALLBACK_MAX_CHARS):
     logging.info("Using fallback parser...")
     try:
         if not dom_chunks or not parse_description:
             logging.warning("No content or search description provided.")
             return "No content or search description provided."
-            
-        results = []
-        # Convert parse description to lowercase for case-insensitive matching
-        parse_desc_lower = parse_description.lower()
-        
-        # Create a list of stopwords to filter out
-        stopwords = ['the', 'and', 'that', 'with', 'from', 'this', 'these', 'for', 'are', 'was', 
-                    'were', 'will', 'have', 'has', 'had', 'not', 'what', 'when', 'where', 'who', 
-                    'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'some', 
-                    'such', 'than', 'too', 'very', 'can', 'cannot', 'could', 'may', 'might', 
-                    'must', 'need', 'ought', 'shall', 'should', 'would']
-        
-        # Extract key terms from the parse description
-        # This is a very basic approach and won't work for complex queries
-        key_terms = [term.strip() for term in re.split(r'[,\s\-_]+', parse_desc_lower) 
-                    if len(term.strip()) > 2 and term.strip() not in stopwords]
-        
-        # If no key terms were found, use the whole description
-        if not key_terms and len(parse_desc_lower) > 2:
-            key_terms = [parse_desc_lower]
-        
+
+        key_terms = _extract_key_terms(parse_description)
+        if not key_terms:
+            logging.warning("No matching information found. Try refining your search terms.")
+            return "No matching information found. Try refining your search terms."
         logging.info(f"Fallback parser using key terms: {key_terms}")
-        
-        for i, chunk in enumerate(dom_chunks, start=1):
-            try:
-                chunk_lower = chunk.lower()
-                matches = []
-                
-                # Look for sentences containing the key terms
-                sentences = re.split(r'(?<=[.!?])\s+', chunk)
-                for sentence in sentences:
-                    # Skip very short sentences
-                    if len(sentence.strip()) < 10:
-                        continue
-                        
-                    # Check if any key term is in the sentence
-                    if any(term in sentence.lower() for term in key_terms):
-                        matches.append(sentence.strip())
-                
-                if matches:
-                    results.append("\n".join(matches))
-            except Exception as chunk_error:
-                logging.error(f"An error occurred while processing chunk {i} in fallback parser: {chunk_error}")
-                continue
-            
-        if not results:
-            # Try a more lenient approach if no results were found
-            for i, chunk in enumerate(dom_chunks, start=1):
-                try:
-                    # Look for paragraphs containing at least one key term
-                    paragraphs = chunk.split('\n\n')
-                    for paragraph in paragraphs:
-                        if any(term in paragraph.lower() for term in key_terms):
-                            results.append(paragraph.strip())
-                except Exception:
-                    continue
-        
-        if not results:
+
+        matcher = _build_term_matcher(key_terms)
+        scored = _score_sentences(_build_sentence_index(dom_chunks), matcher)
+
+        # Very short fragments ("Price.") only count when nothing better matched
+        substantial = [entry for entry in scored if len(entry[4]) >= 10]
+        scored = substantial or scored
+
+        if not scored:
             logging.warning("No matching information found. Try refining your search terms.")
             return "No matching information found. Try refining your search terms."
-        
-        # Limit the total length of results to avoid overwhelming the user
-        combined_results = "\n\n".join(results)
-        if len(combined_results) > 5000:
-            combined_results = combined_results[:5000] + "\n\n[Output truncated due to length...]\n"
-            
+
+        # Take the best matches that fit in the output budget...
+        scored.sort(key=lambda entry: (-entry[0], -entry[1], entry[2]))
+        selected = []
+        used = 0
+        for entry in scored:
+            sentence = entry[4]
+            if used + len(sentence) > max_chars:
+                if selected:
+                    continue
+                # A single huge match is still better than nothing
+                entry = entry[:4] + (sentence[:max_chars],)
+            selected.append(entry)
+            # Sentences are joined by one newline, or two between chunks; count the worst case
+            used += len(entry[4]) + 2
+
+        # ...then present them in document order, one paragraph per chunk
+        selected.sort(key=lambda entry: entry[2])
+        results = []
+        current_chunk = None
+        for _, _, _, chunk_index, sentence in selected:
+            if chunk_index != current_chunk:
+                results.append([])
+                current_chunk = chunk_index
+            results[-1].append(sentence)
+        combined_results = "\n\n".join("\n".join(group) for group in results)
+
+        if len(selected) < len(scored):
+            combined_results += "\n\n[Output truncated due to length...]\n"
+
         return combined_results
     except Exception as e:
         error_msg = f"Error in fallback parser: {str(e)}"
         logging.error(error_msg)
         return error_msg
 
-def parse_with_ollama(dom_chunks, parse_description):
-    logging.info("Parsing content with Ollama...")
-    # Check if Ollama is running
-    if model is None:
-        # Check if Ollama is installed
-        is_installed = is_ollama_installed()
-        
-        error_message = (
-            "⚠️ Ollama server is not running or not accessible. \n\n"
-        )
-        logging.error(error_message)
-        return error_message
+class _TokenUsageCallback(BaseCallbackHandler):
+    """Counts prompt and completion tokens, as reported by Ollama or estimated when it doesn't say"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.prompts = prompts
+
+    def on_llm_end(self, response, **kwargs):
+        for prompt, generations in zip(self.prompts, response.generations):
+            for generation in generations:
+                info = generation.generation_info or {}
+                metrics.incr("prompt_tokens", info.get("prompt_eval_count") or estimate_tokens(prompt))
+                metrics.incr("completion_tokens", info.get("eval_count") or estimate_tokens(generation.text))
+
+
+def _llm_config():
+    # Only pay for the callback when someone is collecting metrics
+    return {"callbacks": [_TokenUsageCallback()]} if metrics.is_enabled() else None
+
+
+def _invoke_chunk(chain, inputs, started):
+    # Record when the call actually starts running so queued chunks aren't timed out
+    started.append(time.monotonic())
+    with metrics.span("llm_call", chars=len(inputs["dom_content"])):
+        return chain.invoke(inputs, config=_llm_config())
+
 
+def _parse_chunks(chain, dom_chunks, parse_description, max_workers, retries, chunk_timeout):
+    """
+    Run the chain over every chunk with at most `max_workers` calls in flight.
+    Each chunk is retried up to `retries` times and abandoned after `chunk_timeout`
+    seconds. Returns results in chunk order, with None for chunks that failed.
+    """
+    results = [None] * len(dom_chunks)
+    attempts = [0] * len(dom_chunks)
+    pending = deque(range(len(dom_chunks)))
+    running = {}
+
+    def retry_or_give_up(i, reason):
+        if attempts[i] <= retries:
+            logging.warning(f"Chunk {i + 1} {reason}, retrying (attempt {attempts[i] + 1}/{retries + 1})...")
+            pending.append(i)
+        else:
+            logging.error(f"Chunk {i + 1} {reason}, giving up after {attempts[i]} attempts.")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ollama-chunk")
     try:
-        # Parse the content with Ollama
-        results = []
-        for i, chunk in enumerate(dom_chunks, start=1):
-            logging.info(f"Parsing chunk {i}...")
-            try:
-                prompt = ChatPromptTemplate.from_template(template)
-                chain = prompt | model
-                result = chain.invoke({"dom_content": chunk, "parse_description": parse_description})
-                results.append(result)
-            except Exception as chunk_error:
-                logging.error(f"An error occurred while parsing chunk {i}: {chunk_error}")
-                continue
+        while pending or running:
+            while pending and len(running) < max_workers:
+                i = pending.popleft()
+                attempts[i] += 1
+                logging.info(f"Parsing chunk {i + 1}...")
+                started = []
+                inputs = {"dom_content": dom_chunks[i], "parse_description": parse_description}
+                running[executor.submit(_invoke_chunk, chain, inputs, started)] = (i, started)
+
+            # Wake up for the next completion or the earliest per-chunk deadline; poll while
+            # some calls haven't started yet, since their deadline isn't known
+            deadlines = [started[0] + chunk_timeout for _, started in running.values() if started]
+            timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            if len(deadlines) < len(running):
+                timeout = 0.05 if timeout is None else min(timeout, 0.05)
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i, _ = running.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as chunk_error:
+                    logging.error(f"An error occurred while parsing chunk {i + 1}: {chunk_error}")
+                    retry_or_give_up(i, "failed")
+
+            now = time.monotonic()
+            for future, (i, started) in list(running.items()):
+                if started and now - started[0] >= chunk_timeout:
+                    # The client's own timeout aborts the call shortly; don't wait for it to do so
+                    running.pop(future)
+                    retry_or_give_up(i, f"timed out after {chunk_timeout}s")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def _ollama_unavailable_message():
+    return (
+        "⚠️ Ollama server is not running or not accessible. Showing keyword matches instead.\n\n"
+        f"To start Ollama:\n{get_ollama_start_instructions()}\n\n"
+    )
+
+
+def _lookup_cached(dom_chunks, parse_description, model_name, cache):
+    """Return the cache key and cached result (or None) for every chunk"""
+    results = [None] * len(dom_chunks)
+    if cache is None:
+        return [], results
+    keys = [
+        make_cache_key(chunk, parse_description, model_name, template, TEMPERATURE)
+        for chunk in dom_chunks
+    ]
+    cached = cache.get_many(keys)
+    for i, key in enumerate(keys):
+        results[i] = cached.get(key)
+    logging.info(f"LLM cache: {len(cached)} of {len(dom_chunks)} chunks already extracted.")
+    return keys, results
+
+
+def parse_with_ollama(dom_chunks, parse_description, model=None, max_workers=DEFAULT_CONCURRENCY,
+                      retries=CHUNK_RETRIES, chunk_timeout=CHUNK_TIMEOUT, cache=None, use_cache=True):
+    logging.info("Parsing content with Ollama...")
+    model_name = model or OLLAMA_MODEL
+    try:
+        # Chunks already extracted with the same question, model and prompt skip the model entirely
+        cache = cache or (get_default_cache() if use_cache else None)
+        keys, results = _lookup_cached(dom_chunks, parse_description, model_name, cache)
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            # Check if Ollama is running
+            llm = get_model(model_name, timeout=chunk_timeout)
+            if llm is None:
+                error_message = _ollama_unavailable_message()
+                logging.error(error_message)
+                return error_message + simple_fallback_parser(dom_chunks, parse_description)
+
+            # Build the prompt and chain once and share them across all chunks
+            prompt = ChatPromptTemplate.from_template(template)
+            chain = prompt | llm
+
+            # Parse the uncached chunks concurrently, keeping the results in page order
+            max_workers = max(1, min(max_workers, len(missing)))
+            parsed = _parse_chunks(chain, [dom_chunks[i] for i in missing], parse_description,
+                                   max_workers, retries, chunk_timeout)
+            for i, result in zip(missing, parsed):
+                results[i] = result
+                if cache is not None and result is not None:
+                    cache.set(keys[i], result)
+
+        results = [result for result in results if result is not None]
 
         if not results:
             logging.warning("No results were found.")
@@ -282,3 +508,118 @@ def parse_with_ollama(dom_chunks, parse_description):
     except Exception as e:
         logging.error(f"An error occurred while parsing with Ollama: {e}")
         return f"An error occurred while parsing with Ollama: {e}"
+
+
+# One step of a streamed parse: kind is "token" (a piece of chunk `index`'s answer as it
+# arrives), "chunk" (the full answer for chunk `index`) or "error"
+ParseEvent = namedtuple("ParseEvent", ["kind", "index", "text"])
+
+
+def _stream_chunk(chain, inputs, out, retries):
+    """Push a chunk's tokens onto `out`; retries are only possible before the first token"""
+    for attempt in range(retries + 1):
+        emitted = False
+        try:
+            with metrics.span("llm_call", chars=len(inputs["dom_content"]), streamed=True):
+                for token in chain.stream(inputs, config=_llm_config()):
+                    emitted = True
+                    out.put(("token", token))
+            out.put(("done", None))
+            return
+        except Exception as chunk_error:
+            if emitted or attempt == retries:
+                out.put(("error", chunk_error))
+                return
+            logging.warning(f"Streaming a chunk failed, retrying (attempt {attempt + 2}/{retries + 1}): {chunk_error}")
+
+
+def iter_parse_with_ollama(dom_chunks, parse_description, model=None, max_workers=DEFAULT_CONCURRENCY,
+                           retries=CHUNK_RETRIES, chunk_timeout=CHUNK_TIMEOUT, cache=None, use_cache=True):
+    """
+    Streaming version of parse_with_ollama: a generator of ParseEvents.
+
+    Chunks run concurrently, but events are yielded in page order, so the tokens
+    of the first chunk arrive while later chunks are still being generated.
+    `chunk_timeout` is the longest wait for the next token of a chunk.
+    """
+    logging.info("Streaming content from Ollama...")
+    model_name = model or OLLAMA_MODEL
+    dom_chunks = list(dom_chunks)
+    cache = cache or (get_default_cache() if use_cache else None)
+    keys, results = _lookup_cached(dom_chunks, parse_description, model_name, cache)
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    llm = get_model(model_name, timeout=chunk_timeout) if missing else None
+    if missing and llm is None:
+        error_message = _ollama_unavailable_message()
+        logging.error(error_message)
+        yield ParseEvent("error", None, error_message)
+        yield ParseEvent("chunk", None, simple_fallback_parser(dom_chunks, parse_description))
+        return
+
+    # Build the prompt and chain once and share them across all chunks
+    chain = ChatPromptTemplate.from_template(template) | llm if missing else None
+    streams = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing) or 1)),
+                                  thread_name_prefix="ollama-stream")
+    try:
+        for i in missing:
+            streams[i] = queue.Queue()
+            inputs = {"dom_content": dom_chunks[i], "parse_description": parse_description}
+            executor.submit(_stream_chunk, chain, inputs, streams[i], retries)
+
+        for i in range(len(dom_chunks)):
+            if results[i] is not None:
+                yield ParseEvent("chunk", i, results[i])
+                continue
+            logging.info(f"Streaming chunk {i + 1}...")
+            tokens = []
+            while True:
+                try:
+                    kind, value = streams[i].get(timeout=chunk_timeout)
+                except queue.Empty:
+                    logging.error(f"Chunk {i + 1} produced no output for {chunk_timeout}s, skipping it.")
+                    yield ParseEvent("error", i, f"Chunk {i + 1} timed out")
+                    break
+                if kind == "token":
+                    tokens.append(value)
+                    yield ParseEvent("token", i, value)
+                elif kind == "done":
+                    result = "".join(tokens)
+                    if cache is not None:
+                        cache.set(keys[i], result)
+                    yield ParseEvent("chunk", i, result)
+                    break
+                else:
+                    logging.error(f"An error occurred while parsing chunk {i + 1}: {value}")
+                    yield ParseEvent("error", i, str(value))
+                    break
+    finally:
+        # Stop queued chunks if the caller stops listening early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_with_ollama(dom_chunks, parse_description, **kwargs):
+    """
+    Yield the combined answer as text pieces, ready for st.write_stream or a terminal:
+    tokens as they arrive, with a blank line between the answers of different chunks.
+    Takes the same keyword arguments as iter_parse_with_ollama.
+    """
+    streamed = set()
+    wrote_any = False
+    for event in iter_parse_with_ollama(dom_chunks, parse_description, **kwargs):
+        if event.kind == "error":
+            if event.index is None:
+                yield event.text
+            continue
+        if event.kind == "chunk" and event.index in streamed:
+            continue
+        text = event.text
+        if not text:
+            continue
+        if event.index not in streamed:
+            streamed.add(event.index)
+            if wrote_any:
+                yield "\n\n"
+        wrote_any = True
+        yield text
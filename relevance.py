@@ -0,0 +1,106 @@
+from collections import Counter, defaultdict
+import math
+import re
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset([
+    'the', 'and', 'that', 'with', 'from', 'this', 'these', 'for', 'are', 'was', 'were', 'will',
+    'have', 'has', 'had', 'not', 'what', 'when', 'where', 'who', 'why', 'how', 'all', 'any',
+    'both', 'each', 'few', 'more', 'most', 'some', 'such', 'than', 'too', 'very', 'can',
+    'cannot', 'could', 'may', 'might', 'must', 'need', 'ought', 'shall', 'should', 'would',
+    'a', 'an', 'of', 'to', 'in', 'on', 'is', 'it', 'or', 'be', 'as', 'at', 'by', 'me', 'my',
+    'i', 'you', 'your', 'get', 'give', 'list', 'find', 'extract', 'show', 'please',
+])
+
+
+def _stem(token):
+    # Just enough stemming for "prices" to match "price"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one page.
+
+    Chunks are indexed once into an inverted index, so scoring a query only
+    touches the postings of its terms rather than every chunk.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(chunks)
+        self.lengths = []
+        self.postings = defaultdict(list)
+        for i, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings[term].append((i, count))
+        self.avg_length = (sum(self.lengths) / self.size) if self.size else 0.0
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def score(self, query):
+        """Return one BM25 score per chunk for `query`"""
+        scores = [0.0] * self.size
+        if not self.avg_length:
+            return scores
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * count * (self.k1 + 1) / (count + norm)
+        return scores
+
+
+def select_relevant_chunks(dom_chunks, parse_description, top_k=8, min_score=0.0, report=False):
+    """
+    Keep only the chunks most related to `parse_description`: the `top_k` best
+    scoring ones (all of them if top_k is None) with a score above `min_score`.
+    Selected chunks keep their page order.
+
+    If nothing in the page matches the description lexically, every chunk is
+    kept, since the model may still find what a keyword search can't.
+
+    With `report=True` a list of skipped chunks ({"index", "score", "preview"})
+    is returned alongside the selection.
+    """
+    dom_chunks = list(dom_chunks)
+    scores = BM25Index(dom_chunks).score(parse_description)
+    ranked = sorted(range(len(dom_chunks)), key=lambda i: scores[i], reverse=True)
+    keep = [i for i in ranked if scores[i] > min_score]
+    if top_k is not None:
+        keep = keep[:top_k]
+
+    if not keep:
+        logging.info("No chunk matches the description lexically, keeping all chunks.")
+        keep = range(len(dom_chunks))
+
+    keep = sorted(keep)
+    kept = set(keep)
+    selected = [dom_chunks[i] for i in keep]
+    logging.info(f"Relevance filter kept {len(selected)} of {len(dom_chunks)} chunks.")
+    if not report:
+        return selected
+    skipped = [
+        {"index": i, "score": round(scores[i], 4), "preview": dom_chunks[i][:120]}
+        for i in ranked if i not in kept
+    ]
+    return selected, skipped
@@ -0,0 +1,185 @@
+from selenium.webdriver.chrome.options import Options
+from urllib.parse import urlsplit
+from fnmatch import fnmatch
+from dotenv import load_dotenv
+import threading
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Profile used for hosts without a profile of their own
+DEFAULT_PROFILE = os.getenv("SCRAPER_RENDER_PROFILE", "light")
+# Per-host profiles, as comma-separated host=profile pairs; hosts may use * wildcards
+HOST_PROFILES = os.getenv("SCRAPER_HOST_PROFILES", "")
+
+# URL patterns (Chrome's * wildcards) for each resource type we can block. Chrome's
+# Network.setBlockedURLs only matches URLs, so types are recognised by extension
+RESOURCE_TYPE_PATTERNS = {
+    "image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"),
+    "media": ("mp4", "webm", "mp3", "ogg", "wav", "m4a", "mov", "m3u8"),
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "stylesheet": ("css",),
+}
+
+# Analytics and ad hosts that never carry page content
+TRACKER_PATTERNS = (
+    "*google-analytics.com/*",
+    "*googletagmanager.com/*",
+    "*googlesyndication.com/*",
+    "*doubleclick.net/*",
+    "*connect.facebook.net/*",
+    "*hotjar.com/*",
+    "*segment.io/*",
+    "*scorecardresearch.com/*",
+    "*adservice.google.com/*",
+)
+
+
+def _type_patterns(resource_type):
+    patterns = []
+    for extension in RESOURCE_TYPE_PATTERNS[resource_type]:
+        patterns.append(f"*.{extension}")
+        patterns.append(f"*.{extension}?*")
+    return patterns
+
+
+class RenderProfile:
+    """
+    How Chrome renders pages: headless or not, when navigation counts as
+    done (`page_load_strategy` "normal", "eager" or "none"), which requests are
+    blocked and how large the window and JavaScript heap may get.
+
+    `block_resource_types` takes keys of RESOURCE_TYPE_PATTERNS and
+    `block_url_patterns` extra URL patterns with * wildcards.
+    `max_heap_mb` caps the V8 heap of each renderer.
+    """
+
+    def __init__(self, name, headless=True, page_load_strategy="eager", block_resource_types=(),
+                 block_url_patterns=(), window_size=(1280, 800), max_heap_mb=None, page_load_timeout=30):
+        if page_load_strategy not in ("normal", "eager", "none"):
+            raise ValueError(f"Unknown page load strategy: {page_load_strategy}")
+        unknown = set(block_resource_types) - set(RESOURCE_TYPE_PATTERNS)
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+        self.name = name
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block_resource_types = tuple(block_resource_types)
+        self.block_url_patterns = tuple(block_url_patterns)
+        self.window_size = window_size
+        self.max_heap_mb = max_heap_mb
+        self.page_load_timeout = page_load_timeout
+
+    def __repr__(self):
+        return f"RenderProfile({self.name!r})"
+
+    def blocked_urls(self):
+        patterns = []
+        for resource_type in self.block_resource_types:
+            patterns.extend(_type_patterns(resource_type))
+        patterns.extend(self.block_url_patterns)
+        return patterns
+
+    def options(self):
+        """Chrome options for a new session using this profile"""
+        options = Options()
+        options.page_load_strategy = self.page_load_strategy
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--disable-gpu")
+        if self.window_size:
+            options.add_argument(f"--window-size={self.window_size[0]},{self.window_size[1]}")
+        if self.max_heap_mb:
+            options.add_argument(f"--js-flags=--max-old-space-size={self.max_heap_mb}")
+        if "image" in self.block_resource_types:
+            # Also covers images whose URLs have no extension
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        if "media" in self.block_resource_types:
+            options.add_argument("--autoplay-policy=user-gesture-required")
+            options.add_argument("--mute-audio")
+        for argument in ("--disable-extensions", "--disable-background-networking", "--no-first-run",
+                         "--disable-dev-shm-usage"):
+            options.add_argument(argument)
+        return options
+
+    def apply(self, driver):
+        """Configure a freshly started session; blocked URLs stay in force across navigations"""
+        patterns = self.blocked_urls()
+        if patterns:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            except Exception as e:
+                logging.warning(f"Could not block requests for render profile {self.name}: {e}")
+        if self.page_load_timeout:
+            driver.set_page_load_timeout(self.page_load_timeout)
+
+
+_BLOCK_ALL_TYPES = ("image", "media", "font", "stylesheet")
+
+PROFILES = {
+    # What a desktop user sees: every resource, waiting for the load event
+    "full": RenderProfile("full", headless=False, page_load_strategy="normal", window_size=None),
+    # Text only: skip everything that doesn't change the DOM, return once the DOM is parsed
+    "light": RenderProfile("light", page_load_strategy="eager", block_resource_types=_BLOCK_ALL_TYPES,
+                           block_url_patterns=TRACKER_PATTERNS, window_size=(1280, 800), max_heap_mb=512),
+    # Like light, but navigation returns at once and the wait strategy decides when the page is ready
+    "minimal": RenderProfile("minimal", page_load_strategy="none", block_resource_types=_BLOCK_ALL_TYPES,
+                             block_url_patterns=TRACKER_PATTERNS, window_size=(800, 600), max_heap_mb=256),
+}
+_profiles_lock = threading.Lock()
+
+
+def register_profile(profile):
+    """Make a custom profile available by name"""
+    with _profiles_lock:
+        PROFILES[profile.name] = profile
+
+
+def get_profile(name=None):
+    """Look up a profile by name; None gives the default profile"""
+    name = name or DEFAULT_PROFILE
+    with _profiles_lock:
+        if name not in PROFILES:
+            raise ValueError(f"Unknown render profile: {name} (available: {', '.join(sorted(PROFILES))})")
+        return PROFILES[name]
+
+
+def parse_host_profiles(spec):
+    """Parse 'host=profile,*.host=profile' into a list of (pattern, profile name)"""
+    rules = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, separator, name = item.partition("=")
+        if not separator or not host.strip() or not name.strip():
+            raise ValueError(f"Invalid host profile rule: {item!r} (expected host=profile)")
+        rules.append((host.strip().lower(), name.strip()))
+    return rules
+
+
+_host_rules = parse_host_profiles(HOST_PROFILES)
+
+
+def set_host_profile(host_pattern, name):
+    """Render hosts matching `host_pattern` with the profile `name`; later rules win"""
+    get_profile(name)
+    with _profiles_lock:
+        _host_rules.append((host_pattern.lower(), name))
+
+
+def profile_for_url(url, default=None):
+    """The profile for `url`'s host, falling back to `default` (a name) or the default profile"""
+    host = (urlsplit(url).hostname or "").lower()
+    with _profiles_lock:
+        rules = list(_host_rules)
+    for pattern, name in reversed(rules):
+        if fnmatch(host, pattern):
+            return get_profile(name)
+    return get_profile(default)
@@ -1,10 +1,11 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
+from driver_pool import get_default_pool
+from render_profiles import profile_for_url
+from wait_strategies import wait_until_ready
 import os
-from bs4 import BeautifulSoup
+from extract import extract_text
+from chunking import iter_chunks, DEFAULT_CHUNK_TOKENS
+import metrics
 import logging
 
 load_dotenv()
@@ -12,46 +13,50 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def scrape_website(website):
-    logging.info("Setting up ChromeDriver with WebDriver Manager...")
+def scrape_website(website, wait=5, wait_strategy=None, pool=None, profile=None):
+    """
+    Render `website` in a pooled Chrome session and return its HTML.
+
+    `wait` caps how many seconds to wait for the page to become ready;
+    `wait_strategy` decides what "ready" means (see wait_strategies.py).
+    `profile` names the render profile to use when the host has none of its
+    own (see render_profiles.py).
+    """
+    logging.info("Borrowing a Chrome session from the driver pool...")
+    pool = pool or get_default_pool()
+    profile = profile_for_url(website, default=profile)
     try:
-        # Use WebDriver Manager to automatically download and use the correct ChromeDriver version
-        service = Service(ChromeDriverManager().install())
-        chrome_options = Options()
-        
-        # Launch the local ChromeDriver using a context manager
-        with webdriver.Chrome(service=service, options=chrome_options) as driver:
+        # Reuse a warm browser instead of resolving ChromeDriver and cold-starting Chrome per page
+        with pool.session(profile=profile) as driver:
             logging.info("Navigating to website...")
-            driver.get(website)
-            
-            # Use standard approach with implicit wait
-            driver.implicitly_wait(10)  # Wait up to 10 seconds for elements to be available
-            
-            # Give the page some time to fully load (including any potential captchas)
-            import time
-            time.sleep(5)  # Wait 5 seconds for page to load completely
-            
-            logging.info("Waiting for page to load completely...")
-            # Wait for the page to be fully loaded
-            wait_complete = driver.execute_script("return document.readyState") == "complete"
-            
-            # Additional wait for any potential captchas to appear
-            logging.info("Page loaded, checking for any captchas...")
-            # Just wait a bit more to allow any captchas to appear and be manually solved
-            time.sleep(3)
-            
+            previous_url = driver.current_url
+            with metrics.span("navigation", url=website):
+                driver.get(website)
+
+            logging.info("Waiting for page to be ready...")
+            # Return as soon as the page is ready instead of sleeping a fixed amount
+            with metrics.span("wait") as wait_span:
+                result = wait_until_ready(driver, wait_strategy, timeout=wait, previous_url=previous_url)
+                wait_span.set(strategy=result.strategy, timed_out=result.timed_out)
+            if result.timed_out and driver.current_url == previous_url:
+                raise TimeoutError(f"The browser hadn't started loading {website} after {wait}s")
+
             logging.info("Navigated! Scraping page content...")
             html = driver.page_source
+            metrics.incr("rendered_bytes", len(html))
             return html
     except Exception as e:
         logging.error(f"An error occurred while scraping the website: {e}")
         raise
 
-def extract_body_content(html):
+def extract_body_content(html, keep_structure=True):
     logging.info("Extracting body content...")
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        body_content = soup.find('body').get_text()
+        # Stream the page through lxml, dropping scripts, styles, navigation and footers as we go
+        with metrics.span("extract_body_content", html_chars=len(html)):
+            body_content = extract_text(html, keep_structure=keep_structure)
+        metrics.incr("html_chars", len(html))
+        metrics.incr("text_chars", len(body_content))
         return body_content
     except Exception as e:
         logging.error(f"An error occurred while extracting body content: {e}")
@@ -60,43 +65,24 @@ def extract_body_content(html):
 def clean_body_content(body_content):
     logging.info("Cleaning body content...")
     try:
-        # Remove extra whitespace and newlines
-        cleaned_content = ' '.join(body_content.split())
+        # Remove extra whitespace and blank lines, keeping one line per block of text
+        with metrics.span("clean_body_content"):
+            lines = (' '.join(line.split()) for line in body_content.splitlines())
+            cleaned_content = '\n'.join(line for line in lines if line)
         return cleaned_content
     except Exception as e:
         logging.error(f"An error occurred while cleaning body content: {e}")
         raise
 
-def split_dom_content(content, max_length=4000):
+def split_dom_content(content, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=0, model=None):
     """
-    Split the content into chunks of specified maximum length while trying to maintain
-    complete sentences or logical breaks.
+    Split the content into chunks of at most `max_tokens` (estimated for `model`),
+    breaking on paragraphs, then sentences, then words. See chunking.iter_chunks
+    for a lazy version that doesn't hold every chunk in memory.
     """
-    # If content is shorter than max_length, return it as a single chunk
-    if len(content) <= max_length:
-        return [content]
-    
-    chunks = []
-    current_chunk = ""
-    
-    # Split content into sentences (roughly, by looking for periods followed by spaces)
-    sentences = content.split('. ')
-    
-    for sentence in sentences:
-        # Add period back to sentence (except for the last one if it didn't have one)
-        if sentence != sentences[-1]:
-            sentence += '. '
-            
-        # If adding this sentence would exceed max_length, store current chunk and start new one
-        if len(current_chunk) + len(sentence) > max_length:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence
-        else:
-            current_chunk += sentence
-    
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
\ No newline at end of file
+    logging.info("Splitting content into chunks...")
+    with metrics.span("split_dom_content") as split_span:
+        chunks = list(iter_chunks(content, max_tokens=max_tokens, overlap_tokens=overlap_tokens, model=model))
+        split_span.set(chunks=len(chunks))
+    metrics.incr("chunks", len(chunks))
+    return chunks
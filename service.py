@@ -0,0 +1,677 @@
+"""
+Local job-queue service for scraping and parsing.
+
+Scrape and parse requests become prioritised jobs, run by two separate,
+bounded worker pools: one for scraping (sharing a single Chrome driver pool)
+and one for LLM parsing, so the number of concurrent browsers and Ollama
+requests stays fixed however many users or batch runs submit work. Queues are
+bounded too; when one is full, submissions fail with ServiceBusy (HTTP 429)
+instead of piling up. Cleaned pages and their chunk lists are stored once and
+referenced by ID.
+
+The service runs in-process (the Streamlit app shares one between sessions)
+or as an HTTP server that ServiceClient talks to:
+
+    python service.py --port 8600
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import OrderedDict
+from contextlib import closing
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+from scrape import extract_body_content, clean_body_content, split_dom_content
+from fetch import fetch_page
+from snapshots import refresh_snapshot, get_default_store
+from parse import stream_with_ollama, DEFAULT_CONCURRENCY
+from llm_cache import get_default_cache
+from relevance import select_relevant_chunks
+from dedup import ChunkDeduplicator
+from chunking import DEFAULT_CHUNK_TOKENS
+from driver_pool import DriverPool, DEFAULT_POOL_SIZE
+from wait_strategies import get_wait_strategy
+import itertools
+import threading
+import argparse
+import requests
+import hashlib
+import queue
+import uuid
+import json
+import time
+import sys
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCRAPE_WORKERS = int(os.getenv("SERVICE_SCRAPE_WORKERS", str(DEFAULT_POOL_SIZE)))
+# Parse jobs run one at a time by default; each already sends OLLAMA_NUM_PARALLEL chunks at once
+LLM_WORKERS = int(os.getenv("SERVICE_LLM_WORKERS", "1"))
+MAX_QUEUED = int(os.getenv("SERVICE_MAX_QUEUED", "100"))
+MAX_DOCUMENTS = int(os.getenv("SERVICE_MAX_DOCUMENTS", "200"))
+# Seconds a finished job can still be looked up
+JOB_TTL = float(os.getenv("SERVICE_JOB_TTL", "3600"))
+# Near-duplicate indexes (one per dedup scope and description) kept before the least recently used is dropped
+MAX_DEDUP_SCOPES = int(os.getenv("SERVICE_MAX_DEDUP_SCOPES", "100"))
+DEFAULT_PORT = 8600
+
+# Lower runs first: people waiting in the UI go ahead of batch runs
+INTERACTIVE_PRIORITY = 0
+BATCH_PRIORITY = 10
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class ServiceBusy(Exception):
+    """Raised when a job queue is full; try again later"""
+
+
+class Job:
+    """
+    A unit of work and its progress. Events ({"type": ...} dicts) are appended
+    while the job runs and end with an "end" event once it has finished.
+    """
+
+    def __init__(self, kind, params, priority):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.priority = priority
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def emit(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def start(self):
+        with self._cond:
+            if self.status != "queued":
+                return False
+            self.status = "running"
+            self.started_at = time.time()
+            return True
+
+    def _finish(self, status, result=None, error=None):
+        with self._cond:
+            if self.finished:
+                return
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.events.append({"type": "end", "status": status})
+            self._cond.notify_all()
+
+    def finish(self, result):
+        self._finish("done", result=result)
+
+    def fail(self, error):
+        self._finish("failed", error=error)
+
+    def cancel(self):
+        self._finish("cancelled")
+
+    def iter_events(self, after=0, timeout=None):
+        """Yield events from index `after` on, as they arrive, until the "end" event"""
+        index = after
+        while True:
+            with self._cond:
+                if index >= len(self.events):
+                    if not self._cond.wait_for(lambda: index < len(self.events), timeout):
+                        return
+                events = self.events[index:]
+            index += len(events)
+            for event in events:
+                yield event
+                if event["type"] == "end":
+                    return
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "priority": self.priority,
+                "params": self.params,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "events": len(self.events),
+            }
+
+
+class WorkerPool:
+    """A fixed number of threads running jobs from a bounded priority queue"""
+
+    def __init__(self, name, workers, max_queued, handler):
+        if workers < 1:
+            raise ValueError(f"{name} worker pool needs at least one worker")
+        self.name = name
+        self.handler = handler
+        self.running = 0
+        self._queue = queue.PriorityQueue(maxsize=max_queued)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        try:
+            # Same-priority jobs run in submission order
+            self._queue.put_nowait((job.priority, next(self._order), job))
+        except queue.Full:
+            raise ServiceBusy(f"The {self.name} queue is full ({self._queue.maxsize} jobs), try again later")
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if not job.start():
+                continue  # Cancelled while queued
+            with self._lock:
+                self.running += 1
+            try:
+                job.finish(self.handler(job))
+            except Exception as e:
+                logging.error(f"{job.kind.capitalize()} job {job.id} failed: {e}")
+                job.fail(str(e))
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"workers": len(self._threads), "running": self.running, "queued": self._queue.qsize()}
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._order), None))
+
+
+class DocumentStore:
+    """
+    Cleaned pages and their chunk lists, each stored once and referenced by
+    ID. Document IDs are derived from the URL and content, so scraping an
+    unchanged page again reuses its entry. The least recently used documents,
+    and their chunk lists, are dropped beyond `max_documents`.
+    """
+
+    def __init__(self, max_documents=MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._chunk_lists = {}
+        self._lock = threading.Lock()
+
+    def put_document(self, url, content):
+        document_id = hashlib.sha256(f"{url}\n{content}".encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            if document_id not in self._documents:
+                self._documents[document_id] = {"id": document_id, "url": url, "content": content, "chunk_lists": set()}
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                _, evicted = self._documents.popitem(last=False)
+                for chunks_id in evicted["chunk_lists"]:
+                    self._chunk_lists.pop(chunks_id, None)
+        return document_id
+
+    def put_chunks(self, document_id, chunks, settings):
+        """Store the chunks of a document split with `settings`; returns the chunk list ID"""
+        key = json.dumps([document_id, settings])
+        chunks_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            document = self._documents[document_id]
+            document["chunk_lists"].add(chunks_id)
+            self._chunk_lists[chunks_id] = {"id": chunks_id, "document_id": document_id, "chunks": list(chunks)}
+        return chunks_id
+
+    def get_document(self, document_id):
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is None:
+                raise KeyError(f"Unknown document: {document_id}")
+            self._documents.move_to_end(document_id)
+            return {"id": document["id"], "url": document["url"], "content": document["content"]}
+
+    def get_chunks(self, chunks_id):
+        with self._lock:
+            chunk_list = self._chunk_lists.get(chunks_id)
+            if chunk_list is None:
+                raise KeyError(f"Unknown chunk list: {chunks_id}")
+            return dict(chunk_list)
+
+    def stats(self):
+        with self._lock:
+            return {"documents": len(self._documents), "chunk_lists": len(self._chunk_lists)}
+
+
+class ScraperService:
+    """
+    Runs scrape and parse jobs on separate bounded worker pools.
+
+    A scrape job fetches, extracts, cleans and splits a page, stores the
+    document and its chunks, and returns their IDs. A parse job takes a
+    chunk list ID and a description and streams the extracted text as
+    "text" events. `snapshots` is a SnapshotStore for incremental re-scrapes,
+    or None to always scrape in full.
+    """
+
+    def __init__(self, scrape_workers=SCRAPE_WORKERS, llm_workers=LLM_WORKERS, max_queued=MAX_QUEUED,
+                 pool=None, snapshots=None, documents=None, job_ttl=JOB_TTL):
+        self.pool = pool or DriverPool(size=scrape_workers)
+        self.snapshots = snapshots
+        self.documents = documents or DocumentStore()
+        self.job_ttl = job_ttl
+        self._deduplicators = OrderedDict()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._scrape_pool = WorkerPool("scrape", scrape_workers, max_queued, self._run_scrape)
+        self._llm_pool = WorkerPool("llm", llm_workers, max_queued, self._run_parse)
+
+    def _add_job(self, job, worker_pool):
+        with self._lock:
+            # Forget finished jobs nobody has looked at for a while
+            cutoff = time.time() - self.job_ttl
+            for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+            self._jobs[job.id] = job
+        try:
+            worker_pool.submit(job)
+        except ServiceBusy:
+            with self._lock:
+                del self._jobs[job.id]
+            raise
+        logging.info(f"Queued {job.kind} job {job.id} (priority {job.priority}).")
+        return job.to_dict()
+
+    def submit_scrape(self, url, priority=INTERACTIVE_PRIORITY, wait=5, wait_for=None, force_browser=False,
+                      render_profile=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, chunk_overlap=0, model=None):
+        """Queue a scrape of `url`; its result holds document_id and chunks_id"""
+        if not url:
+            raise ValueError("A URL is required")
+        get_wait_strategy(wait_for)  # Reject a bad spec now rather than in the worker
+        params = {
+            "url": url,
+            "wait": wait,
+            "wait_for": wait_for,
+            "force_browser": force_browser,
+            "render_profile": render_profile,
+            "chunk_tokens": chunk_tokens,
+            "chunk_overlap": chunk_overlap,
+            "model": model,
+        }
+        return self._add_job(Job("scrape", params, priority), self._scrape_pool)
+
+    def submit_parse(self, chunks_id, description, priority=INTERACTIVE_PRIORITY, model=None, top_k=8,
+                     min_score=0.0, dedup_threshold=0.0, dedup_scope=None, use_cache=True,
+                     max_workers=DEFAULT_CONCURRENCY):
+        """
+        Queue parsing the chunk list `chunks_id` for `description`; its result
+        holds the text. With a `dedup_threshold`, chunks nearly repeating one
+        already parsed for the same description in the same `dedup_scope` (a
+        crawl or user session) are skipped; without a scope, only repeats
+        within the page are.
+        """
+        if not description:
+            raise ValueError("A description is required")
+        self.documents.get_chunks(chunks_id)
+        params = {
+            "chunks_id": chunks_id,
+            "description": description,
+            "model": model,
+            "top_k": top_k,
+            "min_score": min_score,
+            "dedup_threshold": dedup_threshold,
+            "dedup_scope": dedup_scope,
+            "use_cache": use_cache,
+            "max_workers": max_workers,
+        }
+        return self._add_job(Job("parse", params, priority), self._llm_pool)
+
+    def _job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job: {job_id}")
+        return job
+
+    def get_job(self, job_id):
+        return self._job(job_id).to_dict()
+
+    def iter_events(self, job_id, after=0, timeout=None):
+        return self._job(job_id).iter_events(after, timeout)
+
+    def wait_job(self, job_id, timeout=None):
+        """Block until the job has finished (or `timeout` passes) and return it"""
+        for _ in self.iter_events(job_id, timeout=timeout):
+            pass
+        return self.get_job(job_id)
+
+    def cancel_job(self, job_id):
+        """Cancel a queued job, or stop a running parse at its next piece of text"""
+        job = self._job(job_id)
+        job.cancel()
+        return job.to_dict()
+
+    def get_document(self, document_id):
+        return self.documents.get_document(document_id)
+
+    def get_chunks(self, chunks_id):
+        return self.documents.get_chunks(chunks_id)
+
+    def stats(self):
+        with self._lock:
+            jobs = {}
+            for job in self._jobs.values():
+                jobs[job.status] = jobs.get(job.status, 0) + 1
+        return {
+            "scrape": self._scrape_pool.stats(),
+            "llm": self._llm_pool.stats(),
+            "jobs": jobs,
+            **self.documents.stats(),
+        }
+
+    def _run_scrape(self, job):
+        params = job.params
+        url = params["url"]
+        fetch_options = dict(
+            wait=params["wait"],
+            wait_strategy=get_wait_strategy(params["wait_for"]),
+            pool=self.pool,
+            force_browser=params["force_browser"],
+            profile=params["render_profile"],
+        )
+        split = partial(split_dom_content, max_tokens=params["chunk_tokens"],
+                        overlap_tokens=params["chunk_overlap"], model=params["model"])
+
+        job.emit({"type": "status", "message": "Fetching the page..."})
+        if self.snapshots is not None:
+            content, diff, not_modified = refresh_snapshot(
+                url, self.snapshots, max_tokens=params["chunk_tokens"], overlap_tokens=params["chunk_overlap"],
+                model=params["model"], **fetch_options
+            )
+            chunks, changed = diff.chunks, len(diff.changed)
+        else:
+            html = fetch_page(url, **fetch_options)
+            job.emit({"type": "status", "message": "Extracting and cleaning the content..."})
+            content = clean_body_content(extract_body_content(html))
+            chunks = split(content)
+            changed, not_modified = len(chunks), False
+
+        document_id = self.documents.put_document(url, content)
+        settings = [params["chunk_tokens"], params["chunk_overlap"], params["model"]]
+        chunks_id = self.documents.put_chunks(document_id, chunks, settings)
+        return {
+            "document_id": document_id,
+            "chunks_id": chunks_id,
+            "chars": len(content),
+            "chunks": len(chunks),
+            "changed_chunks": changed,
+            "not_modified": not_modified,
+        }
+
+    def _deduplicator(self, threshold, scope, description):
+        if scope is None:
+            return ChunkDeduplicator(threshold=threshold)
+        key = (scope, threshold, description)
+        with self._lock:
+            if key in self._deduplicators:
+                self._deduplicators.move_to_end(key)
+            else:
+                self._deduplicators[key] = ChunkDeduplicator(threshold=threshold)
+                while len(self._deduplicators) > MAX_DEDUP_SCOPES:
+                    self._deduplicators.popitem(last=False)
+            return self._deduplicators[key]
+
+    def _run_parse(self, job):
+        params = job.params
+        chunk_list = self.documents.get_chunks(params["chunks_id"])
+        url = self.documents.get_document(chunk_list["document_id"])["url"]
+        chunks = chunk_list["chunks"]
+        total = len(chunks)
+
+        # Headers, footers and banners already parsed from another page of the scope aren't sent again
+        if params["dedup_threshold"] > 0:
+            deduplicator = self._deduplicator(params["dedup_threshold"], params["dedup_scope"], params["description"])
+            chunks, duplicates = deduplicator.filter(chunks, source=url, report=True)
+            if duplicates:
+                job.emit({"type": "skipped", "reason": "duplicate", "total": total, "chunks": duplicates})
+        # Only send the chunks that look related to the description to the model
+        if params["top_k"] > 0 and chunks:
+            kept = len(chunks)
+            chunks, unrelated = select_relevant_chunks(chunks, params["description"], top_k=params["top_k"],
+                                                       min_score=params["min_score"], report=True)
+            if unrelated:
+                job.emit({"type": "skipped", "reason": "unrelated", "total": kept, "chunks": unrelated})
+
+        # Chunks unchanged since the last scrape reuse the extractions made from them then
+        cache = None
+        if self.snapshots is not None and params["use_cache"]:
+            cache = self.snapshots.extractions(url, get_default_cache())
+
+        parts = []
+        pieces = stream_with_ollama(chunks, params["description"], model=params["model"],
+                                    max_workers=params["max_workers"], cache=cache, use_cache=params["use_cache"])
+        with closing(pieces):
+            for piece in pieces:
+                if job.finished:
+                    break  # Cancelled
+                parts.append(piece)
+                job.emit({"type": "text", "text": piece})
+        return {"text": "".join(parts) or "No results were found.", "chunks_parsed": len(chunks)}
+
+    def close(self):
+        self._scrape_pool.close()
+        self._llm_pool.close()
+        self.pool.close()
+
+
+class ServiceClient:
+    """Talks to a service started with `python service.py`; mirrors ScraperService's methods"""
+
+    def __init__(self, base_url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _request(self, method, path, **kwargs):
+        response = self._session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        if response.status_code == 429:
+            raise ServiceBusy(response.json().get("error", "The service is busy"))
+        if response.status_code == 404:
+            raise KeyError(response.json().get("error", path))
+        if response.status_code == 400:
+            raise ValueError(response.json().get("error", "Bad request"))
+        response.raise_for_status()
+        return response.json()
+
+    def submit_scrape(self, url, priority=INTERACTIVE_PRIORITY, **options):
+        return self._request("POST", "/jobs/scrape", json={"url": url, "priority": priority, **options})
+
+    def submit_parse(self, chunks_id, description, priority=INTERACTIVE_PRIORITY, **options):
+        return self._request("POST", "/jobs/parse",
+                             json={"chunks_id": chunks_id, "description": description, "priority": priority, **options})
+
+    def get_job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def iter_events(self, job_id, after=0, timeout=None):
+        response = self._session.get(f"{self.base_url}/jobs/{job_id}/events", params={"after": after},
+                                     stream=True, timeout=(self.timeout, timeout))
+        if response.status_code == 404:
+            raise KeyError(f"Unknown job: {job_id}")
+        response.raise_for_status()
+        with closing(response):
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def wait_job(self, job_id, timeout=None):
+        for _ in self.iter_events(job_id, timeout=timeout):
+            pass
+        return self.get_job(job_id)
+
+    def cancel_job(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def get_document(self, document_id):
+        return self._request("GET", f"/documents/{document_id}")
+
+    def get_chunks(self, chunks_id):
+        return self._request("GET", f"/chunks/{chunks_id}")
+
+    def stats(self):
+        return self._request("GET", "/stats")
+
+
+def _handler_class(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _dispatch(self, action):
+            try:
+                return action()
+            except ServiceBusy as e:
+                self._send_json({"error": str(e)}, status=429, headers={"Retry-After": "1"})
+            except KeyError as e:
+                self._send_json({"error": e.args[0] if e.args else "Not found"}, status=404)
+            except (ValueError, TypeError) as e:
+                self._send_json({"error": str(e)}, status=400)
+
+        def _parts(self):
+            return [part for part in urlsplit(self.path).path.split("/") if part]
+
+        def do_GET(self):
+            parts = self._parts()
+            if parts == ["stats"]:
+                self._send_json(service.stats())
+            elif len(parts) == 2 and parts[0] == "jobs":
+                self._dispatch(lambda: self._send_json(service.get_job(parts[1])))
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+                self._dispatch(lambda: self._stream_events(parts[1]))
+            elif len(parts) == 2 and parts[0] == "documents":
+                self._dispatch(lambda: self._send_json(service.get_document(parts[1])))
+            elif len(parts) == 2 and parts[0] == "chunks":
+                self._dispatch(lambda: self._send_json(service.get_chunks(parts[1])))
+            else:
+                self._send_json({"error": "Not found"}, status=404)
+
+        def do_POST(self):
+            parts = self._parts()
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                self._send_json({"error": f"Invalid JSON: {e}"}, status=400)
+                return
+            if parts == ["jobs", "scrape"]:
+                self._dispatch(lambda: self._send_json(service.submit_scrape(**body), status=202))
+            elif parts == ["jobs", "parse"]:
+                self._dispatch(lambda: self._send_json(service.submit_parse(**body), status=202))
+            else:
+                self._send_json({"error": "Not found"}, status=404)
+
+        def do_DELETE(self):
+            parts = self._parts()
+            if len(parts) == 2 and parts[0] == "jobs":
+                self._dispatch(lambda: self._send_json(service.cancel_job(parts[1])))
+            else:
+                self._send_json({"error": "Not found"}, status=404)
+
+        def _stream_events(self, job_id):
+            query = parse_qs(urlsplit(self.path).query)
+            events = service.iter_events(job_id, after=int(query.get("after", ["0"])[0]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for event in events:
+                    data = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client stopped listening
+
+    return Handler
+
+
+def start_http_server(service, port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serve `service` over HTTP from a background thread"""
+    server = ThreadingHTTPServer((host, port), _handler_class(service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="service-http", daemon=True).start()
+    logging.info(f"Scraper service listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI Web Scraper - job-queue service')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='The address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='The port to listen on')
+    parser.add_argument('--scrape-workers', type=int, default=SCRAPE_WORKERS,
+                        help='The number of pages scraped at once, which is also the number of Chrome sessions')
+    parser.add_argument('--llm-workers', type=int, default=LLM_WORKERS, help='The number of parse jobs run at once')
+    parser.add_argument('--max-queued', type=int, default=MAX_QUEUED,
+                        help='The number of jobs each queue holds before new ones are refused')
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help='Re-scrape and re-parse pages in full instead of reusing what is unchanged since the last scrape')
+    args = parser.parse_args(argv)
+
+    service = ScraperService(
+        scrape_workers=args.scrape_workers,
+        llm_workers=args.llm_workers,
+        max_queued=args.max_queued,
+        snapshots=None if args.no_snapshots else get_default_store(),
+    )
+    server = start_http_server(service, args.port, args.host)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+from collections import namedtuple
+from dotenv import load_dotenv
+from scrape import extract_body_content, clean_body_content, split_dom_content
+from fetch import fetch_page_conditional
+from chunking import DEFAULT_CHUNK_TOKENS
+from functools import partial
+import sqlite3
+import threading
+import json
+import time
+import os
+import logging
+
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(".cache", "snapshots.sqlite3"))
+# Extractions kept per URL before the least recently used ones are dropped
+DEFAULT_MAX_EXTRACTIONS = int(os.getenv("SNAPSHOT_MAX_EXTRACTIONS", "1000"))
+
+# What was seen the last time a URL was scraped
+Snapshot = namedtuple("Snapshot", ["url", "content", "chunks", "chunk_settings", "etag", "last_modified", "fetched_at"])
+
+# Result of diffing new content against a snapshot: the chunks to use, the indices
+# of the chunks that weren't in the snapshot and how many old chunks disappeared
+ChunkDiff = namedtuple("ChunkDiff", ["chunks", "changed", "removed"])
+
+
+def _find_chunk(content, chunk, start):
+    """Find `chunk` in `content` from `start`, only where it isn't part of a longer word"""
+    position = content.find(chunk, start)
+    while position >= 0:
+        end = position + len(chunk)
+        if (position == 0 or content[position - 1].isspace()) and (end == len(content) or content[end].isspace()):
+            return position
+        position = content.find(chunk, position + 1)
+    return position
+
+
+def diff_chunks(previous_chunks, content, split):
+    """
+    Split `content` with `split` while keeping the boundaries of
+    `previous_chunks` (the chunks of the last scrape) wherever they reappear
+    unchanged.
+
+    Re-splitting the whole page would shift every boundary after the first
+    edit, so every later chunk would look new. Instead, the previous chunks
+    are looked up in order in the new content; they are kept as they are, and
+    only the text between them is split again. A chunk counts as changed when
+    it isn't one of the previous chunks.
+    """
+    if not previous_chunks:
+        chunks = split(content)
+        return ChunkDiff(chunks, list(range(len(chunks))), 0)
+
+    known = set(previous_chunks)
+
+    chunks = []
+    cursor = 0   # End of the content covered so far
+    search = 0   # Where to look for the next previous chunk; lags `cursor` when chunks overlap
+    removed = 0
+    for previous in previous_chunks:
+        position = _find_chunk(content, previous, search)
+        if position < 0:
+            removed += 1
+            continue
+        gap = content[cursor:position]
+        if gap.strip():
+            chunks.extend(split(gap))
+        chunks.append(previous)
+        search = position + 1
+        cursor = max(cursor, position + len(previous))
+    tail = content[cursor:]
+    if tail.strip():
+        chunks.extend(split(tail))
+
+    changed = [i for i, chunk in enumerate(chunks) if chunk not in known]
+    return ChunkDiff(chunks, changed, removed)
+
+
+class PageExtractions:
+    """
+    Extractions previously made from one URL's chunks, with the get_many/set
+    interface parse_with_ollama expects from its cache. Misses fall through to
+    `fallback` (usually the shared LLM cache) when one is given.
+    """
+
+    def __init__(self, store, url, fallback=None):
+        self.store = store
+        self.url = url
+        self.fallback = fallback
+
+    def get_many(self, keys):
+        found = self.store.get_extractions(self.url, keys)
+        missing = [key for key in keys if key not in found]
+        if missing and self.fallback is not None:
+            for key, value in self.fallback.get_many(missing).items():
+                found[key] = value
+                self.store.set_extraction(self.url, key, value)
+        return found
+
+    def set(self, key, value):
+        self.store.set_extraction(self.url, key, value)
+        if self.fallback is not None:
+            self.fallback.set(key, value)
+
+
+class SnapshotStore:
+    """
+    Per-URL snapshots of scraped pages, stored in SQLite.
+
+    For every URL it keeps the last cleaned content, the chunks it was split into
+    and the settings they were split with, the ETag/Last-Modified validators used to revalidate the page, and the
+    extractions already made from its chunks.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, max_extractions=DEFAULT_MAX_EXTRACTIONS):
+        self.path = path
+        self.max_extractions = max_extractions
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " url TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " chunks TEXT,"
+            " chunk_settings TEXT,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " checked_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot_extractions ("
+            " url TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " PRIMARY KEY (url, key))"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(snapshots)")}
+        # Stores created before chunk texts and their settings were kept; their snapshots are re-split once
+        for column in ("chunks", "chunk_settings"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE snapshots ADD COLUMN {column} TEXT")
+        self._conn.commit()
+
+    def get(self, url):
+        """Return the Snapshot for `url`, or None if it was never scraped"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, chunks, chunk_settings, etag, last_modified, fetched_at FROM snapshots WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, chunks, chunk_settings, etag, last_modified, fetched_at = row
+        return Snapshot(url, content,
+                        json.loads(chunks) if chunks is not None else None,
+                        json.loads(chunk_settings) if chunk_settings is not None else None,
+                        etag, last_modified, fetched_at)
+
+    def save(self, url, content, chunks=None, etag=None, last_modified=None, chunk_settings=None):
+        """Record the latest content of `url`, the chunks it was split into and the settings used to split it"""
+        now = time.time()
+        chunks = json.dumps(list(chunks)) if chunks is not None else None
+        chunk_settings = json.dumps(list(chunk_settings)) if chunk_settings is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots"
+                " (url, content, chunks, chunk_settings, etag, last_modified, fetched_at, checked_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, content, chunks, chunk_settings, etag, last_modified, now, now)
+            )
+            self._conn.commit()
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Record a revalidation that found the page unchanged, keeping any refreshed validators"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE snapshots SET checked_at = ?, etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url)
+            )
+            self._conn.commit()
+
+    def extractions(self, url, fallback=None):
+        """A cache for parse_with_ollama that reuses the extractions made from this URL before"""
+        return PageExtractions(self, url, fallback)
+
+    def get_extractions(self, url, keys):
+        """Return {key: value} for the stored extractions of `url` among `keys`"""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT value FROM snapshot_extractions WHERE url = ? AND key = ?", (url, key)
+                ).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE snapshot_extractions SET last_access = ? WHERE url = ? AND key = ?",
+                    [(now, url, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def set_extraction(self, url, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot_extractions (url, key, value, last_access) VALUES (?, ?, ?, ?)",
+                (url, key, value, time.time())
+            )
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM snapshot_extractions WHERE url = ?", (url,)
+            ).fetchone()[0]
+            if count > self.max_extractions:
+                self._conn.execute(
+                    "DELETE FROM snapshot_extractions WHERE url = ? AND key IN "
+                    "(SELECT key FROM snapshot_extractions WHERE url = ? ORDER BY last_access LIMIT ?)",
+                    (url, url, count - self.max_extractions)
+                )
+            self._conn.commit()
+
+    def forget(self, url):
+        """Drop the snapshot and extractions of `url`, so the next scrape starts from scratch"""
+        with self._lock:
+            self._conn.execute("DELETE FROM snapshots WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM snapshot_extractions WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """Process-wide snapshot store, or None when SNAPSHOT_PATH is set to an empty value"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None and DEFAULT_SNAPSHOT_PATH:
+            try:
+                _default_store = SnapshotStore()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open the snapshot store at {DEFAULT_SNAPSHOT_PATH}: {e}")
+        return _default_store
+
+
+def refresh_snapshot(url, store, max_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=0, model=None, **fetch_options):
+    """
+    Fetch -> extract -> clean `url`, revalidating it against its snapshot in
+    `store` and recording the result. Returns the cleaned content, a ChunkDiff
+    against the previous scrape and whether the server reported the page as
+    not modified. The content is split like split_dom_content with the given
+    chunk settings; the other keyword arguments are passed to fetch_page.
+    """
+    split = partial(split_dom_content, max_tokens=max_tokens, overlap_tokens=overlap_tokens, model=model)
+    chunk_settings = [max_tokens, overlap_tokens, model]
+    previous = store.get(url)
+    previous_chunks = None
+    if previous is not None and previous.chunk_settings == chunk_settings:
+        # Diff against the boundaries kept last time, not a fresh split, so the extraction keys still match.
+        # Chunks split with other settings could break this call's token budget, so those start over.
+        previous_chunks = previous.chunks if previous.chunks is not None else split(previous.content)
+    if previous is None:
+        fetched = fetch_page_conditional(url, **fetch_options)
+    else:
+        fetched = fetch_page_conditional(url, previous.etag, previous.last_modified, **fetch_options)
+    if fetched.not_modified:
+        if previous_chunks is not None:
+            store.touch(url, fetched.etag, fetched.last_modified)
+            return previous.content, ChunkDiff(previous_chunks, [], 0), True
+        chunks = split(previous.content)
+        store.save(url, previous.content, chunks, fetched.etag or previous.etag,
+                   fetched.last_modified or previous.last_modified, chunk_settings)
+        return previous.content, ChunkDiff(chunks, list(range(len(chunks))), 0), True
+
+    content = clean_body_content(extract_body_content(fetched.html))
+    diff = diff_chunks(previous_chunks, content, split)
+    store.save(url, content, diff.chunks, fetched.etag, fetched.last_modified, chunk_settings)
+    logging.info(f"{len(diff.changed)} of {len(diff.chunks)} chunks changed since the last scrape.")
+    return content, diff, False
@@ -0,0 +1,786 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import random
+import math
+import time
+import json
+import sys
+import io
+import os
+
+import pytest
+from selenium.common.exceptions import WebDriverException, TimeoutException
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+from stub_ollama import StubOllama  # noqa: E402
+
+# parse.py reads the Ollama address when it is first imported, so start the stub before anything else
+STUB_OLLAMA = StubOllama(latency=0.01).start()
+os.environ["OLLAMA_API_URL"] = STUB_OLLAMA.base_url
+# Keep test runs out of the on-disk LLM cache
+os.environ["LLM_CACHE_PATH"] = ""
+
+from chunking import iter_chunks, chars_per_token  # noqa: E402
+from dedup import ChunkDeduplicator  # noqa: E402
+from extract import extract_text  # noqa: E402
+from llm_cache import ExtractionCache  # noqa: E402
+from fetch import fetch_page, needs_javascript, get_host_mode  # noqa: E402
+import metrics  # noqa: E402
+import parse  # noqa: E402
+from parse import parse_with_ollama, simple_fallback_parser, iter_parse_with_ollama, stream_with_ollama  # noqa: E402
+from relevance import select_relevant_chunks  # noqa: E402
+from service import ScraperService, ServiceClient, start_http_server  # noqa: E402
+from batch import run_batch_with_service  # noqa: E402
+from driver_pool import DriverPool, PooledDriver  # noqa: E402
+from scrape import scrape_website, split_dom_content, extract_body_content, clean_body_content  # noqa: E402
+from snapshots import SnapshotStore, diff_chunks, refresh_snapshot  # noqa: E402
+from wait_strategies import WaitStrategy  # noqa: E402
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves server.pages[path] as (body, etag[, content type]), answering 304 when the ETag matches"""
+
+    def do_GET(self, send_body=True):
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        html, etag = page[:2]
+        content_type = page[2] if len(page) > 2 else "text/html; charset=utf-8"
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET(send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def page_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    server.pages = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def article(paragraphs):
+    return "<html><body>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</body></html>"
+
+
+PARAGRAPHS = [
+    f"Paragraph {i} describes product line {i} in detail, covering its price, "
+    f"availability, warranty terms and the shipping options offered in region {i}."
+    for i in range(8)
+]
+
+
+class FakeDriver:
+    """Just enough of a WebDriver for DriverPool; `render(url)` gives the page source"""
+
+    def __init__(self, render=None):
+        self.render = render
+        self.quit_called = False
+        self.current_url = "about:blank"
+        self.page_source = ""
+
+    def execute_script(self, script):
+        return 1
+
+    def delete_all_cookies(self):
+        pass
+
+    def get(self, url):
+        self.current_url = url
+        self.page_source = self.render(url) if self.render and url != "about:blank" else ""
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeDriverPool(DriverPool):
+    def __init__(self, render=None, **kwargs):
+        super().__init__(**kwargs)
+        self.render = render
+
+    def _create_driver(self, profile):
+        return PooledDriver(FakeDriver(self.render), profile.name)
+
+
+class Immediately(WaitStrategy):
+    name = "immediately"
+
+    def is_ready(self, driver):
+        return True
+
+
+def test_driver_pool_release_wakes_blocked_acquire():
+    pool = FakeDriverPool(size=1, idle_timeout=300, profile="light")
+    held = pool.acquire()
+    borrowed = []
+
+    def borrow():
+        borrowed.append(pool.acquire(timeout=5))
+
+    waiter = threading.Thread(target=borrow)
+    waiter.start()
+    time.sleep(0.2)  # Let the waiter block in acquire()
+    started = time.monotonic()
+    pool.release(held)
+    waiter.join(timeout=5)
+    assert borrowed and borrowed[0] is held
+    assert time.monotonic() - started < 1
+    pool.close()
+
+
+def test_driver_pool_acquire_times_out_when_full():
+    pool = FakeDriverPool(size=1, idle_timeout=300, profile="light")
+    held = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.1)
+    pool.release(held)
+    pool.close()
+
+
+def test_driver_pool_session_keeps_the_browser_after_page_errors():
+    pool = FakeDriverPool(size=1, idle_timeout=300, profile="light")
+    with pytest.raises(TimeoutError):
+        with pool.session() as driver:
+            first = driver
+            raise TimeoutError("navigation never committed")
+    with pytest.raises(TimeoutException):
+        with pool.session() as driver:
+            assert driver is first
+            raise TimeoutException("page load timed out")
+    with pytest.raises(WebDriverException):
+        with pool.session() as driver:
+            assert driver is first
+            raise WebDriverException("chrome not reachable")
+    assert first.quit_called
+    with pool.session() as driver:
+        assert driver is not first
+    pool.close()
+
+
+def random_content(rng, oversized=True):
+    """Paragraphs of sentences of unique words, with the odd word longer than any chunk"""
+    counter = iter(range(10 ** 6))
+    paragraphs = []
+    for _ in range(rng.randint(1, 12)):
+        sentences = []
+        for _ in range(rng.randint(1, 6)):
+            words = [f"w{next(counter)}" + "x" * rng.randint(0, 8) for _ in range(rng.randint(1, 25))]
+            if oversized and rng.random() < 0.1:
+                words.append(f"big{next(counter)}" + "y" * rng.randint(100, 600))
+            sentences.append(" ".join(words) + rng.choice(".!?"))
+        paragraphs.append(sentences)
+    return paragraphs
+
+
+def without_whitespace(text):
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_iter_chunks_keeps_the_budget_and_the_text(seed):
+    rng = random.Random(seed)
+    paragraphs = random_content(rng)
+    content = "\n".join(" ".join(sentences) for sentences in paragraphs)
+    model = rng.choice([None, "llama3", "mistral:7b"])
+    max_tokens = rng.randint(5, 120)
+    max_chars = math.floor(max_tokens * chars_per_token(model))
+    chunks = list(iter_chunks(content, max_tokens=max_tokens, model=model))
+
+    assert all(0 < len(chunk) <= max_chars for chunk in chunks)
+    assert without_whitespace("".join(chunks)) == without_whitespace(content)
+    # Larger units are only broken up when they don't fit
+    for sentences in paragraphs:
+        paragraph = " ".join(sentences)
+        if len(paragraph) <= max_chars:
+            assert any(paragraph in chunk for chunk in chunks)
+            continue
+        for sentence in sentences:
+            if len(sentence) <= max_chars:
+                assert any(sentence in chunk for chunk in chunks)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_iter_chunks_overlaps_the_previous_chunk(seed):
+    rng = random.Random(seed)
+    content = "\n".join(" ".join(sentences) for sentences in random_content(rng, oversized=False))
+    max_tokens = rng.randint(20, 120)
+    overlap_tokens = rng.randint(1, max_tokens // 2)
+    max_chars = math.floor(max_tokens * chars_per_token())
+    overlap_chars = math.floor(overlap_tokens * chars_per_token())
+    chunks = list(iter_chunks(content, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
+
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+    # Words are unique, so the overlap is the longest start of a chunk that ends the previous one
+    new_text = [chunks[0]]
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = max((k for k in range(len(chunk)) if previous.endswith(chunk[:k])), default=0)
+        assert overlap <= overlap_chars
+        new_text.append(chunk[overlap:])
+    assert without_whitespace("".join(new_text)) == without_whitespace(content)
+
+
+def test_iter_chunks_repeats_trailing_sentences():
+    content = "\n".join(f"Sentence number {i} is here." for i in range(20))
+    chunks = list(iter_chunks(content, max_tokens=20, overlap_tokens=10))
+    assert len(chunks) > 1
+    assert all(chunk.split("\n")[0] in previous for previous, chunk in zip(chunks, chunks[1:]))
+
+
+def split_small(content):
+    return split_dom_content(content, max_tokens=30)
+
+
+def test_diff_chunks_keeps_boundaries_of_previous_chunks():
+    first = "\n".join(PARAGRAPHS)
+    initial = diff_chunks(None, first, split_small)
+    assert len(initial.changed) == len(initial.chunks)
+
+    edited = first.replace("Paragraph 0 describes", "Paragraph 0 now describes")
+    second = diff_chunks(initial.chunks, edited, split_small)
+    assert 0 < len(second.changed) < len(second.chunks)
+
+    third = diff_chunks(second.chunks, edited, split_small)
+    assert third.chunks == second.chunks
+    assert third.changed == []
+
+
+def test_refresh_snapshot_three_scrapes(page_server, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    url = page_server.url + "/article"
+
+    page_server.pages["/article"] = (article(PARAGRAPHS), None)
+    _, first, not_modified = refresh_snapshot(url, store, max_tokens=30)
+    assert not not_modified and len(first.changed) == len(first.chunks) > 1
+
+    edited = [PARAGRAPHS[0].replace("describes", "now describes")] + PARAGRAPHS[1:]
+    page_server.pages["/article"] = (article(edited), None)
+    _, second, _ = refresh_snapshot(url, store, max_tokens=30)
+    assert 0 < len(second.changed) < len(second.chunks)
+
+    # The same content again reuses the boundaries kept by the second scrape
+    _, third, _ = refresh_snapshot(url, store, max_tokens=30)
+    assert third.changed == []
+    assert third.chunks == second.chunks
+
+    # A 304 hands back the stored chunks, so extraction keys still match
+    page_server.pages["/article"] = (article(edited), '"v1"')
+    refresh_snapshot(url, store, max_tokens=30)
+    _, fourth, not_modified = refresh_snapshot(url, store, max_tokens=30)
+    assert not_modified
+    assert fourth.chunks == third.chunks
+    store.close()
+
+
+def test_refresh_snapshot_resplits_when_chunk_settings_change(page_server, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    url = page_server.url + "/article"
+    page_server.pages["/article"] = (article(PARAGRAPHS), None)
+    _, large, _ = refresh_snapshot(url, store, max_tokens=1000)
+    assert len(large.chunks) == 1
+
+    _, small, _ = refresh_snapshot(url, store, max_tokens=30)
+    assert len(small.chunks) > 1
+    assert len(small.changed) == len(small.chunks)
+    assert all(len(chunk) <= 30 * 3.5 for chunk in small.chunks)
+
+    # A 304 doesn't hand back chunks split with other settings either
+    page_server.pages["/article"] = (article(PARAGRAPHS), '"v1"')
+    refresh_snapshot(url, store, max_tokens=30)
+    _, revalidated, not_modified = refresh_snapshot(url, store, max_tokens=1000)
+    assert not_modified
+    assert revalidated.chunks == large.chunks
+    _, again, not_modified = refresh_snapshot(url, store, max_tokens=1000)
+    assert not_modified and again.changed == []
+    store.close()
+
+
+def test_refresh_snapshot_always_renders_browser_pages(page_server, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    url = page_server.url + "/app"
+    # The app shell never changes, only what its scripts load does
+    page_server.pages["/app"] = ('<html><body><div id="root"></div></body></html>', '"shell"')
+    rendered = {"html": article(PARAGRAPHS)}
+    pool = FakeDriverPool(render=lambda _: rendered["html"], size=1, profile="light")
+    options = {"pool": pool, "wait_strategy": Immediately()}
+
+    _, first, _ = refresh_snapshot(url, store, max_tokens=30, **options)
+    rendered["html"] = article(PARAGRAPHS[:-1] + ["A new closing paragraph about returns and refunds."])
+    content, second, not_modified = refresh_snapshot(url, store, max_tokens=30, **options)
+    assert not not_modified
+    assert "returns and refunds" in content
+    assert second.changed
+    pool.close()
+    store.close()
+
+
+def test_deduplicator_forgets_oldest_chunks():
+    deduplicator = ChunkDeduplicator(max_entries=10)
+    for page in range(30):
+        chunks = [" ".join(f"word{page}x{chunk}x{i}" for i in range(12)) for chunk in range(2)]
+        deduplicator.filter(chunks, source=page)
+    assert deduplicator.stats()["indexed"] == 10
+    assert len(deduplicator._indexed) == 10
+    assert all(entry in deduplicator._entries for bucket in deduplicator._buckets.values() for entry in bucket)
+
+
+def parse_product_pages(service, dedup_threshold, scopes, descriptions):
+    """Parse two pages from one product template; returns the number of chunks parsed for each"""
+    template = ("Acme {name}. Price: {price}. Stainless steel housing with a brushed finish and a cool-touch "
+                "handle. Two year warranty, free delivery on orders over $30, returns accepted within thirty "
+                "days. Customers who bought this item also bought our descaling tablets and a matching mug set. "
+                "Sign up to our newsletter for exclusive offers and early access to seasonal sales.")
+    pages = [template.format(name="Kettle 2000", price="$49.99"), template.format(name="Toaster 3000", price="$39.99")]
+    parsed = []
+    for i, (content, scope, description) in enumerate(zip(pages, scopes, descriptions)):
+        document_id = service.documents.put_document(f"https://shop.example/{i}", content)
+        chunks_id = service.documents.put_chunks(document_id, [content], [])
+        job = service.submit_parse(chunks_id, description, top_k=0, dedup_threshold=dedup_threshold,
+                                   dedup_scope=scope, use_cache=False)
+        parsed.append(service.wait_job(job["id"], timeout=10)["result"]["chunks_parsed"])
+    return parsed
+
+
+def test_service_dedup_is_opt_in_and_scoped():
+    service = ScraperService(scrape_workers=1, llm_workers=1, pool=FakeDriverPool(size=1, profile="light"))
+    try:
+        assert parse_product_pages(service, 0, [None, None], ["price", "price"]) == [1, 1]
+        assert parse_product_pages(service, 0.8, ["alice", "bob"], ["price", "price"]) == [1, 1]
+        assert parse_product_pages(service, 0.8, ["crawl", "crawl"], ["price", "name"]) == [1, 1]
+        assert parse_product_pages(service, 0.8, ["crawl", "crawl"], ["price", "price"]) == [1, 0]
+    finally:
+        service.close()
+
+
+def test_extract_text_keeps_pages_wrapped_in_a_form():
+    html = ('<body><form id="aspnetForm"><div><h1>Title</h1><p>Main article text</p>'
+            '<input name="q" value="search"><select><option>Choice</option></select>'
+            '<textarea>typed</textarea><button>Go</button></div></form></body>')
+    assert extract_text(html) == "# Title\nMain article text"
+
+
+def test_fallback_parser_matches_lines_of_structured_content():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus",
+                           "product_listing.html"), encoding="utf-8") as f:
+        content = clean_body_content(extract_body_content(f.read()))
+    result = simple_fallback_parser(split_dom_content(content), "weight colors")
+    lines = result.splitlines()
+    assert "- Weight: 310 g" in lines and "- Colors: Slate, Orange" in lines
+    # Headings, list items and table rows are matched one line at a time, not as whole blocks
+    assert "Size guide" not in result
+    assert all(len(line) < 120 for line in lines)
+
+
+RELEVANCE_CHUNKS = [
+    "Our company history goes back to 1950.",
+    "Prices: the basic plan costs 10 dollars, the pro plan 25 dollars.",
+    "Contact us by email or phone.",
+    "Every plan includes support. Plan prices exclude tax.",
+    "Read our blog for news.",
+]
+
+
+def test_select_relevant_chunks_keeps_the_top_k_in_page_order():
+    assert select_relevant_chunks(RELEVANCE_CHUNKS, "plan prices", top_k=2) == [RELEVANCE_CHUNKS[1], RELEVANCE_CHUNKS[3]]
+    # The shorter chunk 3 ranks first, but the selection follows the page
+    assert select_relevant_chunks(RELEVANCE_CHUNKS, "plan prices", top_k=1) == [RELEVANCE_CHUNKS[3]]
+    # top_k=None keeps every chunk that matches at all
+    assert select_relevant_chunks(RELEVANCE_CHUNKS, "email news", top_k=None) == [RELEVANCE_CHUNKS[2], RELEVANCE_CHUNKS[4]]
+
+
+def test_select_relevant_chunks_min_score():
+    _, skipped = select_relevant_chunks(RELEVANCE_CHUNKS, "plan prices", top_k=None, report=True)
+    scores = {entry["index"]: entry["score"] for entry in skipped}
+    assert set(scores) == {0, 2, 4} and set(scores.values()) == {0}
+    selected, skipped = select_relevant_chunks(RELEVANCE_CHUNKS, "tax", top_k=None, min_score=100, report=True)
+    # Nothing scores above the minimum, so every chunk is kept
+    assert selected == RELEVANCE_CHUNKS and skipped == []
+    assert select_relevant_chunks(RELEVANCE_CHUNKS, "tax email", top_k=None, min_score=0.5) == [RELEVANCE_CHUNKS[2], RELEVANCE_CHUNKS[3]]
+
+
+def test_select_relevant_chunks_keeps_everything_without_a_match():
+    assert select_relevant_chunks(RELEVANCE_CHUNKS, "zebra", top_k=2) == RELEVANCE_CHUNKS
+    assert select_relevant_chunks([], "plan") == []
+
+
+def test_select_relevant_chunks_reports_skipped_chunks():
+    selected, skipped = select_relevant_chunks(RELEVANCE_CHUNKS, "plan prices", top_k=1, report=True)
+    assert selected == [RELEVANCE_CHUNKS[3]]
+    # Best scoring first, with a preview of each
+    assert skipped[0]["index"] == 1
+    assert sorted(entry["index"] for entry in skipped) == [0, 1, 2, 4]
+    assert skipped[0]["score"] > 0 and skipped[0]["preview"] == RELEVANCE_CHUNKS[1][:120]
+
+
+def test_fallback_parser_prefers_sentences_matching_more_terms():
+    chunks = [
+        "The warranty covers two years. Shipping is free on every order.",
+        "Our warranty and shipping terms are listed below. Unrelated filler sentence here.",
+        "Returns are accepted within 30 days of shipping.",
+    ]
+    # Room for two of the three matching sentences
+    result = simple_fallback_parser(chunks, "warranty shipping", max_chars=110)
+    selected, note = result.split("\n\n[Output truncated")
+    # The sentence matching both terms wins, then the earliest single match; shown in page order
+    assert selected == "The warranty covers two years.\n\nOur warranty and shipping terms are listed below."
+    assert "Unrelated" not in result and "Returns" not in result
+
+
+def test_fallback_parser_keeps_to_the_output_budget():
+    chunks = [f"Sentence {i} mentions the price of item {i}." for i in range(200)]
+    result = simple_fallback_parser(chunks, "price", max_chars=500)
+    assert result.endswith("[Output truncated due to length...]\n")
+    assert len(result.split("\n\n[Output truncated")[0]) <= 500
+    # A single match larger than the budget is cut rather than dropped
+    assert simple_fallback_parser(["price " * 1000], "price", max_chars=100) == ("price " * 1000)[:100].strip()
+    assert simple_fallback_parser(chunks, "zebra").startswith("No matching information found")
+
+
+def test_parse_with_ollama_aborts_timed_out_calls(monkeypatch):
+    monkeypatch.setattr(STUB_OLLAMA, "latency", 3)
+    started = time.monotonic()
+    result = parse_with_ollama(["first chunk", "second chunk"], "anything", chunk_timeout=0.5, retries=1,
+                               use_cache=False)
+    # Two attempts per chunk, run side by side, each cut off by the client after 0.5s
+    assert time.monotonic() - started < 2
+    assert result == "No results were found."
+
+
+def test_batch_through_service_keeps_host_limits_and_retries(page_server):
+    for i in range(3):
+        page_server.pages[f"/page{i}"] = (article(PARAGRAPHS[:4] + [f"Page {i} has its own closing remarks."]), None)
+    failures = {"/flaky": 1}
+
+    def render(url):
+        path = url[len(page_server.url):]
+        if failures.get(path):
+            failures[path] -= 1
+            raise RuntimeError("Renderer crashed")
+        return article(PARAGRAPHS)
+
+    service = ScraperService(scrape_workers=2, llm_workers=1,
+                             pool=FakeDriverPool(render=render, size=2, profile="light"))
+    server = start_http_server(service, port=0)
+    client = ServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    urls = [page_server.url + path for path in ("/page0", "/page1", "/page2", "/flaky")]
+    output = io.StringIO()
+    try:
+        started = time.monotonic()
+        counts = run_batch_with_service(urls, output, client, per_host=1, delay=0.3, retries=2, backoff=0.01,
+                                        deduplicator=ChunkDeduplicator(), wait=0.1)
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+        service.close()
+    records = {record["url"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert counts == {"ok": 4, "failed": 0}
+    # Five requests to one host (the flaky page twice), at least 0.3s apart
+    assert elapsed >= 1.2
+    assert records[page_server.url + "/flaky"]["attempts"] == 2
+    assert sum(record["duplicate_chunks"] for record in records.values()) > 0
+
+
+def test_batch_through_service_passes_relevance_options(page_server):
+    page_server.pages["/article"] = (article(PARAGRAPHS), None)
+    service = ScraperService(scrape_workers=1, llm_workers=1, pool=FakeDriverPool(size=1, profile="light"))
+    server = start_http_server(service, port=0)
+    client = ServiceClient(f"http://127.0.0.1:{server.server_address[1]}")
+
+    def run(**options):
+        output = io.StringIO()
+        run_batch_with_service([page_server.url + "/article"], output, client, parse_description="warranty terms",
+                               delay=0, chunk_tokens=30, **options)
+        return json.loads(output.getvalue())
+
+    try:
+        narrow = run(top_k=2)
+        everything = run(top_k=0)
+    finally:
+        server.shutdown()
+        service.close()
+    assert narrow["ok"] and narrow["chunks"] > 2
+    assert narrow["skipped_chunks"] == {"unrelated": narrow["chunks"] - 2}
+    assert everything["skipped_chunks"] == {}
+
+
+class SlowCommitDriver(FakeDriver):
+    """A browser using the "none" page load strategy: get() returns before the new document exists"""
+
+    def __init__(self, render, commit_delay):
+        super().__init__(render)
+        self.commit_delay = commit_delay
+        self._navigation = None
+
+    def _commit(self):
+        if self._navigation and time.monotonic() >= self._navigation[1]:
+            self.current_url, self.page_source = self._navigation[0], self.render(self._navigation[0])
+            self._navigation = None
+
+    def get(self, url):
+        if url == "about:blank":
+            super().get(url)
+        else:
+            self._navigation = (url, time.monotonic() + self.commit_delay)
+
+    def execute_script(self, script, *args):
+        self._commit()
+        if "document.URL" in script:
+            return self.current_url
+        if "readyState" in script:
+            return "complete"
+        if "performance.now() -" in script:
+            return 10000  # Quiet for ages
+        return None
+
+
+class SlowCommitPool(FakeDriverPool):
+    def _create_driver(self, profile):
+        return PooledDriver(SlowCommitDriver(self.render, commit_delay=0.5), profile.name)
+
+
+def test_scrape_waits_for_the_navigation_to_commit():
+    pool = SlowCommitPool(render=lambda url: article(PARAGRAPHS), size=1, profile="minimal")
+    html = scrape_website("https://slow.example/", wait=3, pool=pool)
+    assert "Paragraph 0" in html
+    pool.close()
+
+
+def test_scrape_fails_when_the_navigation_never_commits():
+    pool = SlowCommitPool(render=lambda url: article(PARAGRAPHS), size=1, profile="minimal")
+    with pytest.raises(TimeoutError):
+        scrape_website("https://slow.example/", wait=0.2, pool=pool)
+    pool.close()
+
+
+def test_needs_javascript():
+    assert not needs_javascript(article(PARAGRAPHS))
+    assert needs_javascript('<html><body><div id="root"></div><script src="app.js"></script></body></html>')
+    assert needs_javascript('<html><body><noscript>Please enable JavaScript to continue.</noscript>'
+                            + "".join(f"<p>{p}</p>" for p in PARAGRAPHS) + "</body></html>")
+    assert needs_javascript("<html><body><p>Loading...</p></body></html>")
+    assert needs_javascript("<html><head><title>No body</title></head></html>")
+
+
+def refuse_to_render(url):
+    raise AssertionError(f"{url} should not have been rendered")
+
+
+def test_fetch_page_skips_the_browser_for_server_rendered_pages(page_server):
+    page_server.pages["/static"] = (article(PARAGRAPHS), None)
+    pool = FakeDriverPool(render=refuse_to_render, size=1, profile="light")
+    url = page_server.url + "/static"
+    assert "Paragraph 7" in fetch_page(url, pool=pool)
+    assert get_host_mode(url) == "http"
+    pool.close()
+
+
+@pytest.mark.parametrize("page", [
+    ('<html><body><div id="app"></div></body></html>', None),
+    ('{"not": "html"}', None, "application/json"),
+])
+def test_fetch_page_renders_pages_that_need_a_browser(page_server, page):
+    page_server.pages["/app"] = page
+    pool = FakeDriverPool(render=lambda url: article(PARAGRAPHS), size=1, profile="light")
+    html = fetch_page(page_server.url + "/app", pool=pool, wait=0.1)
+    assert "Paragraph 7" in html
+    pool.close()
+
+
+def test_fetch_page_renders_when_the_server_is_unreachable():
+    pool = FakeDriverPool(render=lambda url: article(PARAGRAPHS), size=1, profile="light")
+    # Nothing listens on port 9 of this machine
+    assert "Paragraph 0" in fetch_page("http://127.0.0.1:9/", pool=pool, wait=0.1)
+    pool.close()
+
+
+def test_parse_with_ollama_keeps_chunk_order():
+    chunks = [f"chunk{i} " + PARAGRAPHS[i] for i in range(6)]
+    requests_before = STUB_OLLAMA.requests
+    result = parse_with_ollama(chunks, "product lines", max_workers=3, use_cache=False)
+    answers = result.split("\n\n")
+    assert len(answers) == len(chunks)
+    # The stub answers with the start of the prompt, which embeds the chunk
+    assert all(f"chunk{i}" in answer for i, answer in enumerate(answers))
+    assert STUB_OLLAMA.requests - requests_before >= len(chunks)
+
+
+class MemoryCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_many(self, keys):
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def test_parse_with_ollama_reuses_cached_chunks():
+    cache = MemoryCache()
+    first = parse_with_ollama(PARAGRAPHS[:3], "warranty", cache=cache)
+    requests_before = STUB_OLLAMA.requests
+    assert parse_with_ollama(PARAGRAPHS[:3], "warranty", cache=cache) == first
+    assert STUB_OLLAMA.requests == requests_before
+
+
+def test_iter_parse_with_ollama_yields_chunks_in_page_order(monkeypatch):
+    monkeypatch.setattr(STUB_OLLAMA, "token_delay", 0.005)
+    chunks = [f"chunk{i} " + PARAGRAPHS[i] for i in range(4)]
+    events = list(iter_parse_with_ollama(chunks, "product lines", max_workers=4, use_cache=False))
+    indices = [event.index for event in events]
+    assert indices == sorted(indices) and set(indices) == set(range(len(chunks)))
+    for i in range(len(chunks)):
+        own = [event for event in events if event.index == i]
+        # Every token of a chunk comes before its one "chunk" event, which holds the whole answer
+        assert [event.kind for event in own] == ["token"] * (len(own) - 1) + ["chunk"]
+        assert own[-1].text == "".join(event.text for event in own[:-1])
+        assert f"chunk{i}" in own[-1].text
+    streamed = "".join(stream_with_ollama(chunks, "product lines", use_cache=False))
+    assert streamed == parse_with_ollama(chunks, "product lines", use_cache=False)
+
+
+def test_iter_parse_with_ollama_reuses_cached_chunks():
+    cache = MemoryCache()
+    list(iter_parse_with_ollama(PARAGRAPHS[:2], "warranty", cache=cache))
+    requests_before = STUB_OLLAMA.requests
+    events = list(iter_parse_with_ollama(PARAGRAPHS[:3], "warranty", cache=cache))
+    # Cached chunks arrive whole, without tokens; only the new chunk is sent to Ollama
+    assert [(event.kind, event.index) for event in events if event.index < 2] == [("chunk", 0), ("chunk", 1)]
+    assert {event.kind for event in events if event.index == 2} == {"token", "chunk"}
+    assert STUB_OLLAMA.requests - requests_before == 1
+
+
+def test_streaming_falls_back_to_keyword_matches_when_ollama_is_down(monkeypatch):
+    # A cached failed health check, as if the server had just stopped answering
+    monkeypatch.setitem(parse._health, STUB_OLLAMA.base_url, (False, time.monotonic()))
+    requests_before = STUB_OLLAMA.requests
+    events = list(iter_parse_with_ollama(PARAGRAPHS[:3], "warranty", use_cache=False))
+    assert [(event.kind, event.index) for event in events] == [("error", None), ("chunk", None)]
+    assert events[1].text == simple_fallback_parser(PARAGRAPHS[:3], "warranty")
+    streamed = "".join(stream_with_ollama(PARAGRAPHS[:3], "warranty", use_cache=False))
+    assert streamed.startswith("⚠️ Ollama server is not running") and "warranty terms" in streamed
+    assert STUB_OLLAMA.requests == requests_before
+
+
+def test_ollama_health_is_cached_for_its_ttl():
+    stub = StubOllama(latency=0).start()
+    url = stub.base_url
+    try:
+        assert parse.get_ollama_health(url, max_age=60)
+        # Clients are created on first use and shared afterwards
+        assert parse.get_model("llama3", base_url=url) is parse.get_model("llama3", base_url=url)
+    finally:
+        stub.stop()
+    # Within the TTL the stopped server still counts as up, without asking it
+    assert parse.get_ollama_health(url, max_age=60)
+    assert not parse.get_ollama_health(url, max_age=0)
+    # A failed check is cached too, so callers fall back without waiting on the server
+    assert not parse.get_ollama_health(url, max_age=60)
+    assert parse.get_model("llama3", base_url=url) is None
+
+
+@pytest.fixture
+def metrics_enabled(tmp_path):
+    trace_path = tmp_path / "trace.jsonl"
+    metrics.reset()
+    metrics.enable(str(trace_path))
+    yield trace_path
+    metrics.disable()
+    metrics.reset()
+
+
+def test_spans_are_traced_with_their_parent(metrics_enabled):
+    with metrics.span("fetch", url="http://example.com") as outer:
+        with metrics.span("extract"):
+            pass
+        outer.set(status=200)
+    with pytest.raises(ValueError):
+        with metrics.span("parse"):
+            raise ValueError("bad chunk")
+    metrics.disable()
+    events = [json.loads(line) for line in metrics_enabled.read_text().splitlines()]
+    # Spans are written as they finish, so the inner one comes first
+    assert [event["name"] for event in events] == ["extract", "fetch", "parse"]
+    assert events[0]["parent"] == "fetch" and events[1]["parent"] is None
+    assert events[1]["attrs"] == {"url": "http://example.com", "status": 200}
+    assert events[2]["error"] == "ValueError('bad chunk')"
+    assert all(event["duration"] >= 0 and event["thread"] == threading.current_thread().name for event in events)
+
+
+def test_metrics_in_prometheus_format(metrics_enabled):
+    metrics.incr("chunks", 3)
+    metrics.incr("chunks")
+    for duration in (0.001, 0.2, 500):
+        metrics._observe("llm_call", duration)
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE scraper_chunks_total counter" in lines and "scraper_chunks_total 4" in lines
+    assert "# TYPE scraper_stage_duration_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith('scraper_stage_duration_seconds_bucket{stage="llm_call"')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    # Cumulative buckets, with the observation above the largest bound only in +Inf
+    assert counts == sorted(counts) and len(counts) == len(metrics.BUCKETS) + 1
+    assert 'scraper_stage_duration_seconds_bucket{stage="llm_call",le="0.005"} 1' in lines
+    assert 'scraper_stage_duration_seconds_bucket{stage="llm_call",le="120.0"} 2' in lines
+    assert 'scraper_stage_duration_seconds_bucket{stage="llm_call",le="+Inf"} 3' in lines
+    assert 'scraper_stage_duration_seconds_sum{stage="llm_call"} 500.201000' in lines
+    assert 'scraper_stage_duration_seconds_count{stage="llm_call"} 3' in lines
+
+
+def test_metrics_cost_nothing_while_disabled():
+    metrics.disable()
+    metrics.reset()
+    with metrics.span("fetch") as span:
+        span.set(status=200)
+    metrics.incr("chunks")
+    assert metrics.summary() == {"stages": [], "counters": {}}
+
+
+def test_extraction_cache_evicts_in_batches(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_entries=50, ttl=3600, evict_every=10)
+    for i in range(55):
+        cache.set(f"key{i}", f"value{i}")
+    # Over the limit until the next eviction pass, at most evict_every entries
+    assert cache.stats()["entries"] == 55
+    for i in range(55, 60):
+        cache.set(f"key{i}", f"value{i}")
+    assert cache.stats()["entries"] == 50
+    assert cache.get("key0") is None and cache.get("key59") == "value59"
+    cache.close()
+
+
+def test_extraction_cache_get_many(tmp_path, monkeypatch):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    for i in range(1200):
+        cache.set(f"key{i}", f"value{i}")
+    keys = [f"key{i}" for i in range(0, 1300, 2)]
+    found = cache.get_many(keys + keys[:5])
+    assert found == {f"key{i}": f"value{i}" for i in range(0, 1200, 2)}
+    assert cache.stats()["hits"] == 600 and cache.stats()["misses"] == 50
+
+    # Expired entries are misses and are dropped
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 120)
+    assert cache.get_many(["key0", "key1"]) == {}
+    monkeypatch.undo()
+    assert cache.stats()["entries"] == 1198
+    cache.close()
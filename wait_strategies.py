@@ -0,0 +1,229 @@
+from collections import deque
+import copy
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# How long the most recent waits actually took, newest last
+WAIT_LOG = deque(maxlen=1000)
+
+
+class WaitResult:
+    """Outcome of a single page-readiness wait"""
+
+    def __init__(self, strategy, elapsed, timed_out):
+        self.strategy = strategy
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+
+    def __repr__(self):
+        return f"WaitResult(strategy={self.strategy!r}, elapsed={self.elapsed:.3f}, timed_out={self.timed_out})"
+
+
+class WaitStrategy:
+    """
+    Base class for page-readiness checks.
+
+    `prepare()` runs once right after navigation, `is_ready()` is polled until it
+    returns True or the timeout cap is hit.
+    """
+
+    name = "base"
+
+    def prepare(self, driver):
+        pass
+
+    def is_ready(self, driver):
+        raise NotImplementedError
+
+
+class ReadyState(WaitStrategy):
+    """Ready once `document.readyState` reaches the requested state"""
+
+    def __init__(self, state="complete"):
+        self.state = state
+        self.name = f"readystate:{state}"
+
+    def is_ready(self, driver):
+        current = driver.execute_script("return document.readyState")
+        if self.state == "interactive":
+            return current in ("interactive", "complete")
+        return current == self.state
+
+
+class NetworkIdle(WaitStrategy):
+    """Ready once no new resources have finished loading for `idle_time` seconds"""
+
+    name = "network-idle"
+
+    # Resource timing entries only appear once a response has finished, and the
+    # performance buffer stops recording after 250 of them by default, so count
+    # them through an observer (which has no such limit) instead of reading the
+    # buffer. `buffered` replays what loaded before the observer was installed;
+    # a larger buffer keeps that replay from being cut short.
+    _COUNT_RESOURCES = (
+        "if (window.__scraperResources === undefined) {"
+        "  window.__scraperResources = 0;"
+        "  performance.setResourceTimingBufferSize(10000);"
+        "  new PerformanceObserver(function (list) {"
+        "    window.__scraperResources += list.getEntries().length;"
+        "  }).observe({type: 'resource', buffered: true});"
+        "}"
+        "return window.__scraperResources;"
+    )
+
+    def __init__(self, idle_time=0.5):
+        self.idle_time = idle_time
+        self._last_count = None
+        self._last_change = None
+
+    def prepare(self, driver):
+        self._last_count = driver.execute_script(self._COUNT_RESOURCES)
+        self._last_change = time.monotonic()
+
+    def is_ready(self, driver):
+        count = driver.execute_script(self._COUNT_RESOURCES)
+        now = time.monotonic()
+        if count != self._last_count:
+            self._last_count = count
+            self._last_change = now
+            return False
+        return now - self._last_change >= self.idle_time
+
+
+class DomQuiet(WaitStrategy):
+    """Ready once the DOM has not mutated for `quiet_time` seconds"""
+
+    name = "dom-quiet"
+
+    def __init__(self, quiet_time=0.3):
+        self.quiet_time = quiet_time
+
+    def prepare(self, driver):
+        driver.execute_script(
+            "window.__scraperLastMutation = performance.now();"
+            "if (!window.__scraperObserver) {"
+            "  window.__scraperObserver = new MutationObserver(function () {"
+            "    window.__scraperLastMutation = performance.now();"
+            "  });"
+            "  window.__scraperObserver.observe(document, "
+            "    {childList: true, subtree: true, attributes: true, characterData: true});"
+            "}"
+        )
+
+    def is_ready(self, driver):
+        quiet_ms = driver.execute_script(
+            "return performance.now() - (window.__scraperLastMutation || 0);"
+        )
+        return quiet_ms >= self.quiet_time * 1000
+
+
+class SelectorPresent(WaitStrategy):
+    """Ready once an element matching the CSS selector exists"""
+
+    def __init__(self, selector):
+        self.selector = selector
+        self.name = f"selector:{selector}"
+
+    def is_ready(self, driver):
+        return driver.execute_script("return document.querySelector(arguments[0]) !== null;", self.selector)
+
+
+class AllOf(WaitStrategy):
+    """Ready once every wrapped strategy is ready"""
+
+    def __init__(self, *strategies):
+        self.strategies = strategies
+        self.name = "+".join(s.name for s in strategies)
+
+    def prepare(self, driver):
+        for strategy in self.strategies:
+            strategy.prepare(driver)
+
+    def is_ready(self, driver):
+        # Evaluate each strategy every poll so the stateful ones keep tracking
+        return all([strategy.is_ready(driver) for strategy in self.strategies])
+
+
+def default_wait_strategy():
+    return AllOf(ReadyState("complete"), DomQuiet())
+
+
+def get_wait_strategy(spec):
+    """
+    Build a strategy from a comma-separated spec such as
+    "readystate,network-idle,dom-quiet,selector:#main".
+    """
+    if not spec:
+        return default_wait_strategy()
+    strategies = []
+    for part in spec.split(","):
+        part = part.strip()
+        name, _, arg = part.partition(":")
+        if name == "readystate":
+            strategies.append(ReadyState(arg or "complete"))
+        elif name == "network-idle":
+            strategies.append(NetworkIdle(float(arg)) if arg else NetworkIdle())
+        elif name == "dom-quiet":
+            strategies.append(DomQuiet(float(arg)) if arg else DomQuiet())
+        elif name == "selector":
+            if not arg:
+                raise ValueError("The selector wait strategy needs a CSS selector, e.g. selector:#main")
+            strategies.append(SelectorPresent(arg))
+        elif part:
+            raise ValueError(f"Unknown wait strategy: {part}")
+    if len(strategies) == 1:
+        return strategies[0]
+    return AllOf(*strategies)
+
+
+def _wait_for_navigation(driver, previous_url, deadline, poll_interval):
+    """
+    Poll until the browser has left `previous_url`. With the "none" page load
+    strategy driver.get() returns before the new document exists, and the old
+    one (a finished, quiet about:blank) would satisfy every strategy at once.
+    """
+    while True:
+        try:
+            if driver.execute_script("return document.URL") != previous_url:
+                return True
+        except Exception:
+            pass  # No script context while the navigation commits
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+def wait_until_ready(driver, strategy=None, timeout=5, poll_interval=0.05, previous_url=None):
+    """
+    Poll `strategy` until the page is ready or `timeout` seconds have passed.
+    Pass the URL the browser showed before navigating as `previous_url` so the
+    wait can't finish on the old document.
+    """
+    # Strategies keep per-wait state, so work on a private copy when one is shared between threads
+    strategy = copy.deepcopy(strategy) if strategy is not None else default_wait_strategy()
+    start = time.monotonic()
+    deadline = start + timeout
+    timed_out = False
+    try:
+        if previous_url is not None and not _wait_for_navigation(driver, previous_url, deadline, poll_interval):
+            timed_out = True
+        else:
+            strategy.prepare(driver)
+            while not strategy.is_ready(driver):
+                if time.monotonic() >= deadline:
+                    timed_out = True
+                    break
+                time.sleep(poll_interval)
+    except Exception as e:
+        # A navigation mid-wait can invalidate the script context; don't fail the scrape over it
+        logging.warning(f"Wait strategy {strategy.name} failed, continuing with the current page: {e}")
+    result = WaitResult(strategy.name, time.monotonic() - start, timed_out)
+    WAIT_LOG.append(result)
+    if timed_out:
+        logging.warning(f"Page not ready after {timeout}s ({strategy.name}), continuing anyway...")
+    else:
+        logging.info(f"Page ready after {result.elapsed:.3f}s ({strategy.name})")
+    return result